@@ -177,25 +177,41 @@ app.get("/api/pdf", async (req, res) => {
   }
 
   try {
-    const result = await db.query(
-      "SELECT pdf_file FROM pdfdata WHERE pdf_name = $1",
-      [name]
+    // The backend reads from the blob store or the database and answers Range requests,
+    // so the viewer can fetch only the parts of the file it is showing
+    const response = await axios.get(
+      `http://localhost:8000/api/pdf-file/${encodeURIComponent(name)}`,
+      {
+        responseType: "stream",
+        headers: req.headers.range ? { Range: req.headers.range } : {},
+        validateStatus: (status) => status < 500,
+      }
     );
 
-    if (result.rows.length === 0) {
+    if (response.status === 404) {
+      response.data.resume();
       return res.status(404).json({ error: "PDF not found" });
     }
 
-    const pdfBuffer = result.rows[0].pdf_file;
-
-    // Set content-disposition with page anchor if available
-    const disposition = `inline; filename="${name}.pdf"${
-      page ? `#page=${page}` : ""
-    }`;
-
-    res.setHeader("Content-Type", "application/pdf");
-    res.setHeader("Content-Disposition", disposition);
-    res.send(pdfBuffer);
+    res.status(response.status);
+    if (response.status === 200 || response.status === 206) {
+      // Set content-disposition with page anchor if available
+      const disposition = `inline; filename="${name}.pdf"${
+        page ? `#page=${page}` : ""
+      }`;
+      res.setHeader("Content-Type", "application/pdf");
+      res.setHeader("Content-Disposition", disposition);
+    } else if (response.headers["content-type"]) {
+      // Errors such as 416 carry the backend's JSON body, not PDF bytes
+      res.setHeader("Content-Type", response.headers["content-type"]);
+    }
+    for (const header of ["content-length", "content-range", "accept-ranges"]) {
+      if (response.headers[header]) {
+        res.setHeader(header, response.headers[header]);
+      }
+    }
+    res.on("close", () => response.data.destroy());
+    response.data.pipe(res);
   } catch (error) {
     console.error("Error retrieving PDF:", error);
     res.status(500).json({ message: "Server error", error: error.message });
@@ -264,6 +280,41 @@ function addLog(message) {
   }
 }
 
+// Persist one query/answer pair and make sure its chat session exists
+async function saveChatExchange(chatId, query, data) {
+  // Create chat session if it doesn't exist
+  await db.query(
+    `INSERT INTO chat_sessions (chat_id, name) 
+     VALUES ($1, $2) 
+     ON CONFLICT (chat_id) DO NOTHING`,
+    [chatId, data.chat_name || `Chat ${new Date().toISOString()}`]
+  );
+
+  // Store in database
+  await db.query(
+    `INSERT INTO chat_history 
+     (chat_id, query, answer, pdf_references, online_images, online_videos, online_links, relevant_queries, settings, chosen_pdfs) 
+     VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)`,
+    [
+      chatId,
+      query,
+      data.answer,
+      JSON.stringify(data.pdf_references || []),
+      JSON.stringify(data.online_images || []),
+      JSON.stringify(data.online_videos || []),
+      JSON.stringify(data.online_links || []),
+      JSON.stringify(data.related_queries || []),
+      JSON.stringify(
+        data.settings || {
+          useOnlineContext: true,
+          useDatabase: true,
+        }
+      ),
+      JSON.stringify(data.chosen_pdfs || []),
+    ]
+  );
+}
+
 // Remove the proxy middleware and handle the route directly
 app.post("/api/query", async (req, res) => {
   try {
@@ -290,37 +341,7 @@ app.post("/api/query", async (req, res) => {
 
     const data = aiResponse.data;
 
-    // Create chat session if it doesn't exist
-    await db.query(
-      `INSERT INTO chat_sessions (chat_id, name) 
-       VALUES ($1, $2) 
-       ON CONFLICT (chat_id) DO NOTHING`,
-      [finalChatId, data.chat_name || `Chat ${new Date().toISOString()}`]
-    );
-
-    // Store in database
-    await db.query(
-      `INSERT INTO chat_history 
-       (chat_id, query, answer, pdf_references, online_images, online_videos, online_links, relevant_queries, settings, chosen_pdfs) 
-       VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)`,
-      [
-        finalChatId,
-        query,
-        data.answer,
-        JSON.stringify(data.pdf_references || []),
-        JSON.stringify(data.online_images || []),
-        JSON.stringify(data.online_videos || []),
-        JSON.stringify(data.online_links || []),
-        JSON.stringify(data.related_queries || []),
-        JSON.stringify(
-          data.settings || {
-            useOnlineContext: true,
-            useDatabase: true,
-          }
-        ),
-        JSON.stringify(data.chosen_pdfs || []),
-      ]
-    );
+    await saveChatExchange(finalChatId, query, data);
 
     // Send response back to frontend
     res.json({
@@ -336,6 +357,70 @@ app.post("/api/query", async (req, res) => {
   }
 });
 
+// Streaming variant of /api/query: relays the AI server's Server-Sent Events and
+// stores the exchange once the final "done" event arrives
+app.post("/api/query/stream", async (req, res) => {
+  const { query, org_query, chat_id } = req.body;
+  const finalChatId = chat_id || crypto.randomUUID();
+
+  try {
+    const aiResponse = await axios.post(
+      "http://localhost:8000/api/query/stream",
+      {
+        query,
+        org_query,
+        chat_id: finalChatId,
+        settings: req.body.settings || {
+          useOnlineContext: true,
+          useDatabase: true,
+        },
+        chosen_pdfs: req.body.chosen_pdfs || [],
+      },
+      {
+        headers: { "Content-Type": "application/json" },
+        responseType: "stream",
+      }
+    );
+
+    res.writeHead(200, {
+      "Content-Type": "text/event-stream",
+      "Cache-Control": "no-cache",
+      Connection: "keep-alive",
+      "X-Accel-Buffering": "no",
+    });
+    res.write(`event: chat_id\ndata: ${JSON.stringify(finalChatId)}\n\n`);
+
+    let buffer = "";
+    aiResponse.data.setEncoding("utf8");
+    aiResponse.data.on("data", (chunk) => {
+      res.write(chunk);
+      buffer += chunk;
+      const events = buffer.split("\n\n");
+      buffer = events.pop();
+      for (const event of events) {
+        if (!event.startsWith("event: done\n")) continue;
+        const data = JSON.parse(event.slice(event.indexOf("data: ") + 6));
+        saveChatExchange(finalChatId, query, data).catch((error) =>
+          console.error("Error saving streamed query:", error)
+        );
+      }
+    });
+    aiResponse.data.on("end", () => res.end());
+    aiResponse.data.on("error", (error) => {
+      console.error("Error streaming query:", error);
+      res.end();
+    });
+    // Stop the upstream pipeline when the browser goes away
+    res.on("close", () => aiResponse.data.destroy());
+  } catch (error) {
+    console.error("Error processing query stream:", error);
+    res.status(500).json({
+      error: "Failed to process query",
+      details: error.message,
+    });
+  }
+});
+
 // PDF Management Endpoints
 app.post("/api/upload-pdf", upload.single("file"), async (req, res) => {
   try {
@@ -356,7 +441,7 @@ app.post("/api/upload-pdf", upload.single("file"), async (req, res) => {
       }
     );
 
-    res.json(response.data);
+    res.status(response.status).json(response.data);
   } catch (error) {
     console.error("Error uploading PDF:", error);
     res.status(500).json({
@@ -366,6 +451,68 @@ app.post("/api/upload-pdf", upload.single("file"), async (req, res) => {
   }
 });
 
+// Bulk ingestion of many PDFs or zip archives. The multipart body is streamed through rather
+// than buffered, and there is no timeout: the backend answers once every file is stored.
+app.post("/api/upload-pdfs", async (req, res) => {
+  try {
+    const response = await axios.post(
+      "http://localhost:8000/api/upload-pdfs",
+      req,
+      {
+        headers: {
+          "Content-Type": req.headers["content-type"],
+          ...(req.headers["content-length"]
+            ? { "Content-Length": req.headers["content-length"] }
+            : {}),
+        },
+        maxBodyLength: Infinity,
+        maxContentLength: Infinity,
+        validateStatus: (status) => status < 500,
+      }
+    );
+
+    res.status(response.status).json(response.data);
+  } catch (error) {
+    console.error("Error uploading PDFs:", error);
+    res.status(500).json({
+      error: "Failed to upload PDFs",
+      details: error.message,
+    });
+  }
+});
+
+app.get("/api/ingest-jobs/:job_id", async (req, res) => {
+  try {
+    const response = await axios.get(
+      `http://localhost:8000/api/ingest-jobs/${encodeURIComponent(
+        req.params.job_id
+      )}`
+    );
+    res.json(response.data);
+  } catch (error) {
+    console.error("Error fetching ingestion job:", error);
+    res.status(error.response?.status || 500).json({
+      error: "Failed to fetch ingestion job",
+      details: error.message,
+    });
+  }
+});
+
+app.get("/api/ingest-jobs", async (req, res) => {
+  try {
+    const response = await axios.get("http://localhost:8000/api/ingest-jobs", {
+      params: req.query,
+    });
+    res.json(response.data);
+  } catch (error) {
+    console.error("Error listing ingestion jobs:", error);
+    res.status(500).json({
+      error: "Failed to list ingestion jobs",
+      details: error.message,
+    });
+  }
+});
+
 app.get("/api/search-pdfs", async (req, res) => {
   try {
     const { search_query } = req.query;
@@ -384,6 +531,24 @@ app.get("/api/search-pdfs", async (req, res) => {
   }
 });
 
+app.get("/api/pdf-chunk/:pdf_name/:chunk_id", async (req, res) => {
+  try {
+    const { pdf_name, chunk_id } = req.params;
+    const response = await axios.get(
+      `http://localhost:8000/api/pdf-chunk/${encodeURIComponent(
+        pdf_name
+      )}/${chunk_id}`
+    );
+    res.json(response.data);
+  } catch (error) {
+    console.error("Error fetching PDF chunk:", error);
+    res.status(error.response?.status || 500).json({
+      error: "Failed to fetch PDF chunk",
+      details: error.message,
+    });
+  }
+});
+
 app.delete("/api/delete-pdf/:pdf_name", async (req, res) => {
   try {
     const { pdf_name } = req.params;
@@ -105,6 +105,17 @@ function DocumentModal({ isOpen, onClose }) {
     });
   };
 
+  const waitForIngestJob = async (jobId) => {
+    for (;;) {
+      const { data: job } = await axios.get(
+        `http://localhost:5000/api/ingest-jobs/${jobId}`
+      );
+      if (job.status === "done") return job;
+      if (job.status === "failed") throw new Error(job.error);
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+    }
+  };
+
   const handleUpload = async () => {
     if (selectedFiles.length === 0) return;
 
@@ -121,7 +132,7 @@ function DocumentModal({ isOpen, onClose }) {
       formData.append("file", file);
 
       try {
-        await axios.post("http://localhost:5000/api/upload-pdf", formData, {
+        const { data } = await axios.post("http://localhost:5000/api/upload-pdf", formData, {
           headers: {
             "Content-Type": "multipart/form-data",
           },
@@ -135,6 +146,8 @@ function DocumentModal({ isOpen, onClose }) {
             }));
           },
         });
+        // The server ingests in the background; wait until the document is stored
+        await waitForIngestJob(data.job_id);
         setCompletedUploads((prev) => new Set([...prev, file.name]));
         toast.success(`Successfully uploaded: ${file.name}`);
       } catch (error) {
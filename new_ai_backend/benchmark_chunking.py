@@ -0,0 +1,131 @@
+import argparse
+import functools
+import random
+import time
+from typing import Dict, List
+import numpy as np
+import model_registry
+from upload_pdf import (
+    CHUNK_MAX_TOKENS,
+    CHUNK_OVERLAP_TOKENS,
+    EMBED_BATCH_SIZE,
+    chunk_sentences,
+    chunk_text,
+    count_tokens,
+    ends_sentence,
+    extract_pdf_text,
+)
+from embedding_store import parse_page_range
+
+# Vectors per document and retrieval quality of the word-window chunker against the sentence
+# chunker on a sample corpus of PDFs. Queries are pieces of sentences from the corpus; a hit is a
+# retrieved chunk from the same PDF whose page range covers the sentence's page.
+
+QUERY_MIN_WORDS = 8
+QUERY_MAX_WORDS = 40
+# Share of a sentence's words kept in its query, as one contiguous run
+QUERY_KEEP = 0.6
+
+def load_corpus(paths: List[str]) -> Dict[str, List[tuple]]:
+    corpus = {}
+    for path in paths:
+        with open(path, "rb") as f:
+            text_with_pages = extract_pdf_text(f.read())
+        if text_with_pages:
+            corpus[path] = text_with_pages
+        else:
+            print(f"Skipping {path}: no text extracted")
+    return corpus
+
+def sample_queries(corpus: Dict[str, List[tuple]], count: int, rng: random.Random) -> List[dict]:
+    """Contiguous pieces of random sentences, with the page the sentence starts on."""
+    sentences = []
+    for path, text_with_pages in corpus.items():
+        words = [word for word, _ in text_with_pages]
+        start = 0
+        for i in range(len(words)):
+            if ends_sentence(words, i):
+                if QUERY_MIN_WORDS <= i + 1 - start <= QUERY_MAX_WORDS:
+                    sentences.append((path, start, i + 1))
+                start = i + 1
+    queries = []
+    for path, start, end in rng.sample(sentences, min(count, len(sentences))):
+        keep = max(QUERY_MIN_WORDS // 2, int((end - start) * QUERY_KEEP))
+        offset = start + rng.randint(0, end - start - keep)
+        words = corpus[path][offset:offset + keep]
+        queries.append({"text": ' '.join(word for word, _ in words), "pdf": path, "page": int(words[0][1])})
+    return queries
+
+def encode(texts: List[str]) -> np.ndarray:
+    """Unit-length embeddings, bypassing the embedding cache so every run encodes."""
+    matrix = np.asarray(model_registry.encode(texts, batch_size=EMBED_BATCH_SIZE, convert_to_numpy=True),
+                        dtype=np.float32)
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+def evaluate(name: str, chunker, corpus: Dict[str, List[tuple]], queries: List[dict],
+             query_matrix: np.ndarray, top_k: int) -> dict:
+    start = time.perf_counter()
+    chunks = [(path, text, page_str) for path, text_with_pages in corpus.items()
+              for text, page_str in chunker(text_with_pages)]
+    chunk_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matrix = encode([text for _, text, _ in chunks])
+    embed_seconds = time.perf_counter() - start
+
+    ranges = [(path, *parse_page_range(page_str)) for path, _, page_str in chunks]
+    hits_at_1 = hits_at_k = reciprocal_ranks = 0.0
+    for query, vector in zip(queries, query_matrix):
+        top = np.argsort(-(matrix @ vector))[:top_k]
+        for rank, i in enumerate(top, start=1):
+            path, first, last = ranges[i]
+            if path == query["pdf"] and first <= query["page"] <= last:
+                hits_at_1 += rank == 1
+                hits_at_k += 1
+                reciprocal_ranks += 1 / rank
+                break
+
+    pages = sum(len({page for _, page in text_with_pages}) for text_with_pages in corpus.values())
+    return {
+        "name": name,
+        "chunks": len(chunks),
+        "per_page": len(chunks) / pages,
+        "tokens": np.mean([count_tokens(text) for _, text, _ in chunks]),
+        "chunk_s": chunk_seconds,
+        "embed_s": embed_seconds,
+        "index_mb": matrix.nbytes / 1e6,
+        "hit_1": hits_at_1 / len(queries),
+        "hit_k": hits_at_k / len(queries),
+        "mrr": reciprocal_ranks / len(queries)
+    }
+
+def run(paths: List[str], queries: int, top_k: int, max_tokens: List[int], overlap_tokens: int, seed: int = 0):
+    corpus = load_corpus(paths)
+    if not corpus:
+        return
+    sample = sample_queries(corpus, queries, random.Random(seed))
+    query_matrix = encode([query["text"] for query in sample])
+    words = sum(len(text_with_pages) for text_with_pages in corpus.values())
+    print(f"{len(corpus)} PDFs, {words:,} words, {len(sample)} queries")
+
+    chunkers = [("words 20/5", chunk_text)]
+    for limit in max_tokens:
+        chunkers.append((f"sentences {limit}/{overlap_tokens}",
+                         functools.partial(chunk_sentences, max_tokens=limit, overlap_tokens=overlap_tokens)))
+
+    print(f"{'chunker':>18} {'chunks':>7} {'/page':>6} {'tokens':>7} {'chunk s':>8} {'embed s':>8} "
+          f"{'index MB':>9} {'hit@1':>6} {f'hit@{top_k}':>6} {'MRR':>6}")
+    for name, chunker in chunkers:
+        r = evaluate(name, chunker, corpus, sample, query_matrix, top_k)
+        print(f"{r['name']:>18} {r['chunks']:>7,} {r['per_page']:>6.1f} {r['tokens']:>7.1f} {r['chunk_s']:>8.2f} "
+              f"{r['embed_s']:>8.2f} {r['index_mb']:>9.2f} {r['hit_1']:>6.3f} {r['hit_k']:>6.3f} {r['mrr']:>6.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark word-window and sentence chunking")
+    parser.add_argument("pdfs", nargs="+", help="PDF files of the sample corpus")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--max-tokens", type=int, nargs="+", default=[64, CHUNK_MAX_TOKENS, 128])
+    parser.add_argument("--overlap-tokens", type=int, default=CHUNK_OVERLAP_TOKENS)
+    args = parser.parse_args()
+    run(args.pdfs, args.queries, args.top_k, args.max_tokens, args.overlap_tokens)
@@ -0,0 +1,43 @@
+import argparse
+import os
+import time
+from typing import List
+from pdf_extract import count_pages, extract_parallel, extract_serial
+
+# Pages per second of the serial pdfplumber walk versus page ranges on the process pool.
+# The first parallel run per worker count also pays for spawning the pool and is not timed.
+
+def best_of(fn, repeats: int) -> float:
+    """Best wall-clock time of several runs, in seconds."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def run(pdf_path: str, worker_counts: List[int], repeats: int):
+    with open(pdf_path, "rb") as f:
+        pdf_bytes = f.read()
+    pages = count_pages(pdf_bytes)
+    print(f"{os.path.basename(pdf_path)}: {pages} pages, {len(pdf_bytes) / 1e6:.1f} MB")
+
+    expected = extract_serial(pdf_bytes)
+    serial_time = best_of(lambda: extract_serial(pdf_bytes), repeats)
+    print(f"{'workers':>8} {'seconds':>9} {'pages/s':>9} {'speedup':>8}")
+    print(f"{'serial':>8} {serial_time:>9.2f} {pages / serial_time:>9.1f} {1:>7.1f}x")
+
+    for workers in worker_counts:
+        # Warm-up run starts the pool; it must also produce the serial result exactly
+        assert extract_parallel(pdf_bytes, workers) == expected, f"result mismatch with {workers} workers"
+        parallel_time = best_of(lambda: extract_parallel(pdf_bytes, workers), repeats)
+        print(f"{workers:>8} {parallel_time:>9.2f} {pages / parallel_time:>9.1f} "
+              f"{serial_time / parallel_time:>7.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark PDF text extraction")
+    parser.add_argument("pdf", help="PDF file to extract")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, os.cpu_count() or 1])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    run(args.pdf, args.workers, args.repeats)
@@ -0,0 +1,90 @@
+import argparse
+import time
+from typing import List
+import numpy as np
+from vector_index import VectorIndex
+
+# Memory versus recall of int8 chunk vectors with exact rescoring, against the float32 index,
+# for both chunk search (search_relevant_texts) and PDF scoring (identify_relevant_pdfs).
+
+DIM = 384
+TOPICS = 200
+TOPICS_PER_PDF = 4
+NOISE = 0.6
+TOP_K = 5
+
+def build_corpus(pdfs: int, chunks_per_pdf: int, rng: np.random.Generator) -> List[np.ndarray]:
+    """Chunk matrices that are noisy samples of a few shared topics per PDF."""
+    topics = rng.standard_normal((TOPICS, DIM)).astype(np.float32)
+    corpus = []
+    for _ in range(pdfs):
+        chosen = rng.choice(TOPICS, TOPICS_PER_PDF, replace=False)
+        centers = topics[rng.choice(chosen, chunks_per_pdf)]
+        corpus.append(centers + NOISE * rng.standard_normal((chunks_per_pdf, DIM)).astype(np.float32))
+    return corpus
+
+def build_index(corpus: List[np.ndarray], quantization: str) -> VectorIndex:
+    index = VectorIndex(flat_limit=np.iinfo(np.int64).max, quantization=quantization)
+    # Built in memory; keep the index from loading pdfdata
+    index._loaded = True
+    for i, matrix in enumerate(corpus):
+        vectors = [{"vector": row, "text": f"pdf {i} chunk {j}", "page_number": "1"}
+                   for j, row in enumerate(matrix)]
+        index.add_document(f"pdf-{i}", vectors, "")
+    return index
+
+def chunk_hits(index: VectorIndex, query) -> List[tuple]:
+    return [(hit["pdf_name"], hit["chunk_id"]) for hit in index.search(query, k=TOP_K)]
+
+def top_pdfs(index: VectorIndex, query) -> List[str]:
+    docs = index.document_scores(query, shortlist=0)
+    docs.sort(key=lambda d: d["max_similarity"] * 0.7 + d["avg_similarity"] * 0.3, reverse=True)
+    return [d["name"] for d in docs[:TOP_K]]
+
+def timed(fn, queries) -> tuple:
+    start = time.perf_counter()
+    results = [fn(q) for q in queries]
+    return results, (time.perf_counter() - start) * 1000 / len(queries)
+
+def recall(results, expected) -> float:
+    return float(np.mean([len(set(r) & set(e)) / len(e) for r, e in zip(results, expected) if e]))
+
+def run(pdfs: int, chunks_per_pdf: int, queries: int, factors: List[int], seed: int = 0):
+    rng = np.random.default_rng(seed)
+    corpus = build_corpus(pdfs, chunks_per_pdf, rng)
+    query_vectors = []
+    for _ in range(queries):
+        matrix = corpus[rng.integers(pdfs)]
+        query_vectors.append(matrix[rng.integers(len(matrix))] + NOISE * rng.standard_normal(DIM).astype(np.float32))
+
+    exact = build_index(corpus, "none")
+    quantized = build_index(corpus, "int8")
+    for index in (exact, quantized):
+        index.search(query_vectors[0])  # flatten the index outside the timings
+
+    expected_chunks, chunk_ms = timed(lambda q: chunk_hits(exact, q), query_vectors)
+    expected_pdfs, pdf_ms = timed(lambda q: top_pdfs(exact, q), query_vectors)
+    exact_memory = exact.memory_stats()
+    quantized_memory = quantized.memory_stats()
+
+    print(f"{pdfs:,} PDFs, {pdfs * chunks_per_pdf:,} chunks, {queries} queries")
+    print(f"float32 resident: {exact_memory['resident_bytes'] / 1e6:.1f} MB; "
+          f"int8 resident: {quantized_memory['resident_bytes'] / 1e6:.1f} MB "
+          f"(+{quantized_memory['spilled_bytes'] / 1e6:.1f} MB memory-mapped)")
+    print(f"{'index':>12} {'search ms':>10} {'recall@5':>9} {'pdfs ms':>8} {'recall@5':>9}")
+    print(f"{'float32':>12} {chunk_ms:>10.2f} {1:>9.3f} {pdf_ms:>8.2f} {1:>9.3f}")
+    for factor in factors:
+        quantized.rescore_factor = factor
+        chunks, q_chunk_ms = timed(lambda q: chunk_hits(quantized, q), query_vectors)
+        top, q_pdf_ms = timed(lambda q: top_pdfs(quantized, q), query_vectors)
+        print(f"{f'int8 x{factor}':>12} {q_chunk_ms:>10.2f} {recall(chunks, expected_chunks):>9.3f} "
+              f"{q_pdf_ms:>8.2f} {recall(top, expected_pdfs):>9.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark int8 chunk vectors with exact rescoring")
+    parser.add_argument("--pdfs", type=int, default=500)
+    parser.add_argument("--chunks-per-pdf", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--rescore-factor", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+    run(args.pdfs, args.chunks_per_pdf, args.queries, args.rescore_factor)
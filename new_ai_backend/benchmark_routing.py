@@ -0,0 +1,70 @@
+import argparse
+import time
+from typing import List
+import numpy as np
+from vector_index import DOC_SHORTLIST, VectorIndex
+
+# Latency and recall of two-stage document routing (representatives shortlist, then exact
+# chunk scoring) against exhaustive scoring of every chunk, on a synthetic topical corpus.
+
+DIM = 384
+TOPICS = 200
+TOPICS_PER_PDF = 4
+NOISE = 0.6
+TOP_PDFS = 5
+
+def combined_scores(docs: List[dict]) -> List[str]:
+    """PDF names ranked the way identify_relevant_pdfs ranks them."""
+    docs = sorted(docs, key=lambda d: d["max_similarity"] * 0.7 + d["avg_similarity"] * 0.3, reverse=True)
+    return [d["name"] for d in docs[:TOP_PDFS]]
+
+def build_index(pdfs: int, chunks_per_pdf: int, rng: np.random.Generator):
+    """Index of PDFs whose chunks are noisy samples of a few shared topics."""
+    topics = rng.standard_normal((TOPICS, DIM)).astype(np.float32)
+    index = VectorIndex(flat_limit=np.iinfo(np.int64).max)
+    # Built in memory; keep the index from loading pdfdata
+    index._loaded = True
+    samples = []
+    for i in range(pdfs):
+        chosen = rng.choice(TOPICS, TOPICS_PER_PDF, replace=False)
+        centers = topics[rng.choice(chosen, chunks_per_pdf)]
+        matrix = centers + NOISE * rng.standard_normal((chunks_per_pdf, DIM)).astype(np.float32)
+        vectors = [{"vector": row, "text": f"pdf {i} chunk {j}", "page_number": "1"}
+                   for j, row in enumerate(matrix)]
+        index.add_document(f"pdf-{i}", vectors, "")
+        samples.append(matrix)
+    return index, samples
+
+def run(pdf_counts: List[int], chunks_per_pdf: int, queries: int, shortlists: List[int], seed: int = 0):
+    rng = np.random.default_rng(seed)
+    print(f"{'pdfs':>6} {'chunks':>9} {'shortlist':>10} {'ms/query':>9} {'speedup':>8} {'recall@5':>9}")
+    for pdfs in pdf_counts:
+        index, samples = build_index(pdfs, chunks_per_pdf, rng)
+        # Queries are perturbed chunks, so each has a clearly relevant PDF plus topical neighbours
+        query_vectors = []
+        for _ in range(queries):
+            matrix = samples[rng.integers(pdfs)]
+            query_vectors.append(matrix[rng.integers(len(matrix))] + NOISE * rng.standard_normal(DIM).astype(np.float32))
+        index.document_scores(query_vectors[0], shortlist=0)  # flatten the index outside the timings
+
+        start = time.perf_counter()
+        expected = [combined_scores(index.document_scores(q, shortlist=0)) for q in query_vectors]
+        exhaustive_ms = (time.perf_counter() - start) * 1000 / queries
+        print(f"{pdfs:>6,} {pdfs * chunks_per_pdf:>9,} {'all':>10} {exhaustive_ms:>9.2f} {1:>7.1f}x {1:>9.3f}")
+
+        for shortlist in shortlists:
+            start = time.perf_counter()
+            routed = [combined_scores(index.document_scores(q, shortlist=shortlist)) for q in query_vectors]
+            routed_ms = (time.perf_counter() - start) * 1000 / queries
+            recall = np.mean([len(set(r) & set(e)) / len(e) for r, e in zip(routed, expected)])
+            print(f"{pdfs:>6,} {pdfs * chunks_per_pdf:>9,} {shortlist:>10} {routed_ms:>9.2f} "
+                  f"{exhaustive_ms / routed_ms:>7.1f}x {recall:>9.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark two-stage document routing")
+    parser.add_argument("--pdfs", type=int, nargs="+", default=[100, 300, 1000])
+    parser.add_argument("--chunks-per-pdf", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--shortlist", type=int, nargs="+", default=[10, DOC_SHORTLIST, 50])
+    args = parser.parse_args()
+    run(args.pdfs, args.chunks_per_pdf, args.queries, args.shortlist)
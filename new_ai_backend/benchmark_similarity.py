@@ -0,0 +1,84 @@
+import argparse
+import time
+from typing import List
+import numpy as np
+from similarity import normalize_rows, normalize_vector, select_top_chunks
+
+# Micro-benchmark: the old per-chunk Python scoring loop in search_relevant_texts
+# versus the vectorized kernel used by the vector index.
+
+DIM = 384
+CHUNKS_PER_PDF = 500
+THRESHOLD = 0.1
+PER_PDF_CAP = 10
+GLOBAL_CAP = 5
+# The legacy loop keeps every vector as a Python list; beyond this it is timed on a sample and extrapolated
+LEGACY_MAX_CHUNKS = 100_000
+
+def vector_similarity(vec1: List[float], vec2: List[float]) -> float:
+    """Cosine similarity exactly as main.py used to compute it."""
+    return np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))
+
+def legacy_search(query_vector: List[float], docs: List[List[List[float]]]) -> List[dict]:
+    """The previous search_relevant_texts scoring: per-chunk loop, per-PDF sort, global sort."""
+    relevant_texts = []
+    for pdf_id, vectors in enumerate(docs):
+        chunk_matches = []
+        for chunk_id, vector in enumerate(vectors):
+            similarity = vector_similarity(query_vector, vector)
+            if similarity >= THRESHOLD:
+                chunk_matches.append({'pdf': pdf_id, 'chunk': chunk_id, 'similarity': similarity})
+        if chunk_matches:
+            chunk_matches.sort(key=lambda x: x['similarity'], reverse=True)
+            relevant_texts.extend(chunk_matches[:PER_PDF_CAP])
+    relevant_texts.sort(key=lambda x: x['similarity'], reverse=True)
+    return relevant_texts[:GLOBAL_CAP]
+
+def kernel_search(query_vector: List[float], matrix: np.ndarray, doc_ids: np.ndarray) -> np.ndarray:
+    """One matrix-vector product plus partial-sort selection."""
+    scores = matrix @ normalize_vector(query_vector)
+    return select_top_chunks(scores, doc_ids, GLOBAL_CAP, THRESHOLD, PER_PDF_CAP)
+
+def best_of(fn, repeats: int) -> float:
+    """Best wall-clock time of several runs, in seconds."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def run(sizes: List[int], repeats: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    query = rng.standard_normal(DIM).astype(np.float32).tolist()
+
+    print(f"{'chunks':>10} {'legacy (ms)':>14} {'kernel (ms)':>12} {'speedup':>9}")
+    for n in sizes:
+        raw = rng.standard_normal((n, DIM)).astype(np.float32)
+        matrix = normalize_rows(raw)
+        doc_ids = np.arange(n) // CHUNKS_PER_PDF
+        kernel_time = best_of(lambda: kernel_search(query, matrix, doc_ids), repeats)
+
+        # Legacy path on (a sample of) the same vectors as Python lists
+        sample = min(n, LEGACY_MAX_CHUNKS)
+        vectors = raw[:sample].tolist()
+        docs = [vectors[i:i + CHUNKS_PER_PDF] for i in range(0, sample, CHUNKS_PER_PDF)]
+        legacy_time = best_of(lambda: legacy_search(query, docs), 1) * n / sample
+        note = "" if sample == n else f"  (legacy extrapolated from {sample:,})"
+
+        if sample == n:
+            # Both paths must agree on the selected chunks
+            expected = [(d['pdf'], d['chunk']) for d in legacy_search(query, docs)]
+            got = [(int(doc_ids[i]), int(i % CHUNKS_PER_PDF)) for i in kernel_search(query, matrix, doc_ids)]
+            assert expected == got, f"result mismatch at {n} chunks"
+
+        print(f"{n:>10,} {legacy_time * 1000:>14.1f} {kernel_time * 1000:>12.2f} "
+              f"{legacy_time / kernel_time:>8.0f}x{note}")
+        del raw, matrix, vectors, docs
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark chunk similarity scoring")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    run(args.sizes, args.repeats)
@@ -0,0 +1,132 @@
+import hashlib
+import mmap
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+# Directory for original PDF files; empty keeps them in pdfdata.pdf_file
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", "")
+# Unreferenced blobs younger than this are kept by collect_garbage, since an upload
+# writes its blob before the row that references it is committed
+BLOB_GC_GRACE_SECONDS = int(os.getenv("BLOB_GC_GRACE_SECONDS", "3600"))
+READ_CHUNK_SIZE = 1024 * 1024
+
+class BlobStore:
+    """
+    Content-addressed files on local disk, named by their SHA-256 and sharded
+    into two directory levels. Identical PDFs are stored once.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self.path(digest))
+
+    def size(self, digest: str) -> int:
+        return os.path.getsize(self.path(digest))
+
+    def put(self, data: bytes, digest: Optional[str] = None) -> str:
+        """Store data and return its SHA-256; existing content is not written again."""
+        digest = digest or hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if os.path.exists(path):
+            # Refresh the mtime so garbage collection does not race a new reference
+            os.utime(path)
+            return digest
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write next to the target and rename, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return digest
+
+    @contextmanager
+    def open_mmap(self, digest: str) -> Iterator[mmap.mmap]:
+        """Read-only memory map of a blob; pages are loaded only as they are touched."""
+        with open(self.path(digest), "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+
+    def read_range(self, digest: str, start: int, end: int) -> bytes:
+        """Bytes [start, end] of a blob, inclusive as in an HTTP Range header."""
+        with self.open_mmap(digest) as mapped:
+            return mapped[start:end + 1]
+
+    def iter_file(self, digest: str, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[bytes]:
+        """Whole blob in chunks, for streaming responses."""
+        with open(self.path(digest), "rb") as f:
+            while True:
+                data = f.read(chunk_size)
+                if not data:
+                    break
+                yield data
+
+    def delete(self, digest: str):
+        try:
+            os.unlink(self.path(digest))
+        except FileNotFoundError:
+            pass
+
+    def digests(self) -> Iterator[str]:
+        """Every stored blob's digest."""
+        for root, _, names in os.walk(self.root):
+            for name in names:
+                if not name.endswith(".tmp"):
+                    yield name
+
+    def collect_garbage(self, referenced: set, grace_seconds: int = BLOB_GC_GRACE_SECONDS) -> int:
+        """Delete blobs not in `referenced` that are older than the grace period."""
+        cutoff = time.time() - grace_seconds
+        deleted = 0
+        for digest in list(self.digests()):
+            if digest in referenced:
+                continue
+            try:
+                if os.path.getmtime(self.path(digest)) < cutoff:
+                    self.delete(digest)
+                    deleted += 1
+            except FileNotFoundError:
+                continue
+        return deleted
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) of a single-range "bytes=" header, or None for the whole file.
+
+    Raises ValueError when a valid range cannot be satisfied. Invalid ranges (such as an end
+    before the start) are ignored, and multi-range requests are answered with the whole file,
+    as RFC 9110 allows.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_str, _, end_str = header[len("bytes="):].strip().partition("-")
+    try:
+        if start_str:
+            start = int(start_str)
+            end = int(end_str) if end_str else size - 1
+            if end_str and end < start:
+                return None
+        else:
+            # Suffix range: the last N bytes, unsatisfiable for N = 0
+            suffix = int(end_str)
+            start = max(size - suffix, 0) if suffix else size
+            end = size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise ValueError(f"Range {header} not satisfiable for {size} bytes")
+    return start, min(end, size - 1)
+
+# Process-wide store, or None when PDFs stay in the database
+blob_store = BlobStore(BLOB_STORE_DIR) if BLOB_STORE_DIR else None
@@ -0,0 +1,149 @@
+import math
+import os
+import re
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+
+# A line is boilerplate (running header, footer, copyright notice) when, after page numbers are
+# masked, it recurs on at least BOILERPLATE_MIN_SHARE of the pages and on at least
+# BOILERPLATE_MIN_PAGES pages. Only the first and last BOILERPLATE_EDGE_LINES lines of a page
+# qualify, and none on pages shorter than twice that, where every line is at an edge.
+# A share above 1 disables the check.
+BOILERPLATE_EDGE_LINES = int(os.getenv("BOILERPLATE_EDGE_LINES", "3"))
+BOILERPLATE_MIN_SHARE = float(os.getenv("BOILERPLATE_MIN_SHARE", "0.3"))
+BOILERPLATE_MIN_PAGES = int(os.getenv("BOILERPLATE_MIN_PAGES", "3"))
+# Chunks whose estimated Jaccard similarity to an earlier chunk of the same document reaches
+# this are not embedded; above 1 keeps every chunk
+DEDUPE_THRESHOLD = float(os.getenv("DEDUPE_THRESHOLD", "0.9"))
+SHINGLE_SIZE = 3
+# 8 bands of 8 rows: pairs at 0.9 similarity become candidates with 99% probability
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 8
+# Boilerplate lines listed in the stats, as examples of what was removed
+BOILERPLATE_EXAMPLES = 5
+
+# Page numbers masked before lines are compared: "Page 3", "page 3 of 40", "3 of 40", "3/40"
+# and lines holding nothing but a number, such as "- 3 -". Other numbers are kept, so body
+# lines that differ only in a value are not mistaken for one recurring line.
+PAGE_NUMBER = re.compile(r"\bpage\s*\d+(\s*(of|/)\s*\d+)?\b|\b\d+\s*(of|/)\s*\d+\b|^\W*\d+\W*$",
+                         re.IGNORECASE)
+
+# Filler lines dropped wherever they appear
+FILLER_LINE = re.compile(r"^\W*(this\s+page\s+(is\s+)?)?intentionally\s+(left\s+)?blank\W*$", re.IGNORECASE)
+
+MERSENNE_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(0)
+# Fixed hash functions, so the same document always keeps the same chunks
+_PERM_A = _rng.integers(1, MERSENNE_PRIME, size=MINHASH_PERMUTATIONS, dtype=np.int64)
+_PERM_B = _rng.integers(0, MERSENNE_PRIME, size=MINHASH_PERMUTATIONS, dtype=np.int64)
+
+def normalize_line(line: str) -> str:
+    """Lower-case with page numbers masked, so "Page 3 of 40" and "Page 4 of 40" are the same line."""
+    return PAGE_NUMBER.sub("#", re.sub(r"\s+", " ", line.lower()).strip())
+
+def candidate_lines(lines: List[str], edge: int = BOILERPLATE_EDGE_LINES) -> Set[int]:
+    """Indexes of a page's lines that may be boilerplate: its first and last `edge` lines,
+    or none if the page has fewer than 2 * `edge` lines."""
+    if len(lines) < 2 * edge:
+        return set()
+    return set(range(edge)) | set(range(len(lines) - edge, len(lines)))
+
+def group_pages(lines_with_pages: List[Tuple[str, str]]) -> List[Tuple[str, List[str]]]:
+    """(page number, lines) in document order."""
+    pages: List[Tuple[str, List[str]]] = []
+    for line, page_str in lines_with_pages:
+        if not pages or pages[-1][0] != page_str:
+            pages.append((page_str, []))
+        pages[-1][1].append(line)
+    return pages
+
+def find_boilerplate(pages: List[Tuple[str, List[str]]], min_share: float = BOILERPLATE_MIN_SHARE,
+                     min_pages: int = BOILERPLATE_MIN_PAGES) -> Set[str]:
+    """Normalized candidate lines that recur on enough pages."""
+    counts = Counter()
+    for _, lines in pages:
+        counts.update({normalize_line(lines[i]) for i in candidate_lines(lines)})
+    needed = max(min_pages, math.ceil(min_share * len(pages)))
+    return {line for line, count in counts.items() if line and count >= needed}
+
+def strip_boilerplate(lines_with_pages: List[Tuple[str, str]], stats: Optional[Dict] = None) -> List[Tuple[str, str]]:
+    """(word, page number) pairs of the lines left after dropping boilerplate and filler lines.
+
+    If a stats dict is given it receives line and word counts before and after, plus a few of
+    the removed boilerplate lines.
+    """
+    pages = group_pages(lines_with_pages)
+    boilerplate = find_boilerplate(pages)
+    text_with_pages = []
+    # Removal count and first occurrence of each normalized line
+    removed: Dict[str, List] = {}
+    lines_removed = words_removed = 0
+    for page_str, lines in pages:
+        candidates = candidate_lines(lines) if boilerplate else set()
+        for i, line in enumerate(lines):
+            normalized = normalize_line(line) if i in candidates else None
+            if normalized in boilerplate or FILLER_LINE.match(line):
+                removed.setdefault(normalized or line, [0, line])[0] += 1
+                lines_removed += 1
+                words_removed += len(line.split())
+                continue
+            text_with_pages.extend((word, page_str) for word in line.split())
+
+    words = len(text_with_pages) + words_removed
+    if lines_removed:
+        print(f"Removed {lines_removed} boilerplate lines ({words_removed} of {words} words) from {len(pages)} pages")
+    if stats is not None:
+        stats.update({
+            "lines": len(lines_with_pages),
+            "lines_removed": lines_removed,
+            "words": words,
+            "words_removed": words_removed,
+            "boilerplate": [line for _, line in sorted(removed.values(), key=lambda r: -r[0])[:BOILERPLATE_EXAMPLES]]
+        })
+    return text_with_pages
+
+def shingle_hashes(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """31-bit hashes of the distinct runs of `size` lower-cased words in a text."""
+    words = re.findall(r"\w+", text.lower())
+    shingles = {' '.join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+    return np.array([zlib.crc32(shingle.encode()) & MERSENNE_PRIME for shingle in shingles], dtype=np.int64)
+
+def minhash(hashes: np.ndarray) -> np.ndarray:
+    """MinHash signature: the smallest value of each permutation over a set of shingle hashes."""
+    if not len(hashes):
+        return np.full(MINHASH_PERMUTATIONS, MERSENNE_PRIME, dtype=np.int64)
+    return ((_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % MERSENNE_PRIME).min(axis=1)
+
+def drop_near_duplicates(chunks: List[Tuple[str, str]], threshold: float = DEDUPE_THRESHOLD,
+                         stats: Optional[Dict] = None) -> List[Tuple[str, str]]:
+    """Chunks left after dropping each one nearly identical to an earlier chunk.
+
+    Signatures are bucketed by band (locality-sensitive hashing), so a chunk is only compared
+    with earlier chunks sharing a band; a pair is a duplicate when the share of equal
+    signature values reaches threshold.
+    """
+    if threshold > 1 or len(chunks) < 2:
+        if stats is not None:
+            stats["chunks_deduplicated"] = 0
+        return list(chunks)
+
+    rows = MINHASH_PERMUTATIONS // MINHASH_BANDS
+    buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(MINHASH_BANDS)]
+    signatures = []
+    kept = []
+    for text_chunk, page_str in chunks:
+        signature = minhash(shingle_hashes(text_chunk))
+        bands = [signature[band * rows:(band + 1) * rows].tobytes() for band in range(MINHASH_BANDS)]
+        candidates = {j for band, key in enumerate(bands) for j in buckets[band].get(key, ())}
+        if any(np.mean(signatures[j] == signature) >= threshold for j in candidates):
+            continue
+        for band, key in enumerate(bands):
+            buckets[band].setdefault(key, []).append(len(signatures))
+        signatures.append(signature)
+        kept.append((text_chunk, page_str))
+
+    if stats is not None:
+        stats["chunks_deduplicated"] = len(chunks) - len(kept)
+    return kept
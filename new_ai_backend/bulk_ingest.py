@@ -0,0 +1,195 @@
+import argparse
+import json
+import os
+import sys
+import time
+import zipfile
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Tuple
+from upload_pdf import (
+    EMBED_BATCH_SIZE,
+    changed_pages,
+    create_tables,
+    extract_pdf_info,
+    extract_pdf_text,
+    get_stored_hashes,
+    hash_file,
+    hash_pages,
+    load_chunk_vectors,
+    store_documents,
+    text_to_vector,
+)
+from semantic_cache import semantic_cache
+
+# Documents written per database transaction
+BULK_WRITE_BATCH = int(os.getenv("BULK_WRITE_BATCH", "8"))
+# Flush the write batch early once the PDFs waiting in it exceed this many bytes
+BULK_MAX_PENDING_BYTES = int(os.getenv("BULK_MAX_PENDING_BYTES", str(256 * 1024 * 1024)))
+
+# (display name, pdf name, reader returning the PDF bytes)
+PdfSource = Tuple[str, str, Callable[[], bytes]]
+
+def pdf_name_for(filename: str) -> str:
+    """PDF name the single-file upload would store for this filename."""
+    return os.path.basename(filename).replace(".pdf", "")
+
+def is_pdf(filename: str) -> bool:
+    return filename.lower().endswith(".pdf")
+
+def zip_sources(archive: BinaryIO, archive_name: str) -> Iterator[PdfSource]:
+    """PDF members of a zip archive; each member is decompressed only when it is read."""
+    with zipfile.ZipFile(archive) as zf:
+        for member in zf.infolist():
+            if member.is_dir() or not is_pdf(member.filename):
+                continue
+            yield (f"{archive_name}/{member.filename}", pdf_name_for(member.filename),
+                   lambda member=member: zf.read(member))
+
+def file_sources(file: BinaryIO, filename: str) -> Iterator[PdfSource]:
+    """Sources in one uploaded or opened file: the file itself or the PDFs in a zip."""
+    if filename.lower().endswith(".zip"):
+        yield from zip_sources(file, filename)
+    elif is_pdf(filename):
+        yield filename, pdf_name_for(filename), file.read
+
+def path_sources(paths: Iterable[str]) -> Iterator[PdfSource]:
+    """PDFs and zip archives on disk, descending into directories. Files are opened one at a time."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                yield from path_sources(os.path.join(root, name) for name in sorted(names))
+        elif is_pdf(path) or path.lower().endswith(".zip"):
+            with open(path, "rb") as f:
+                yield from file_sources(f, path)
+
+def ingest_sources(sources: Iterable[PdfSource], batch_size: int = EMBED_BATCH_SIZE,
+                   write_batch: int = BULK_WRITE_BATCH,
+                   on_result: Callable[[Dict], None] = None) -> Dict:
+    """Extract and embed each PDF in turn, writing them to the database in batches.
+
+    Returns a result per file plus overall throughput. on_result is called as each file finishes.
+    A file mapping to the same PDF name as an earlier one in the run (a/x.pdf and b/x.pdf in one
+    archive) fails instead of silently replacing it.
+    """
+    results: List[Dict] = []
+    # (pdf_name, pdf_bytes, vectors, pdf_info, file_hash, page_hashes, ingest_stats), as store_documents takes them
+    pending: List[Tuple[str, bytes, List[Dict], str, str, Dict[int, str], Dict]] = []
+    pending_results: List[Dict] = []
+    pending_bytes = 0
+    # pdf_name -> file it was first read from
+    seen: Dict[str, str] = {}
+    start = time.perf_counter()
+
+    def finish(result: Dict):
+        results.append(result)
+        if on_result:
+            on_result(result)
+
+    def flush():
+        nonlocal pending, pending_results, pending_bytes
+        errors = store_documents(pending)
+        for result in pending_results:
+            error = errors.get(result["pdf_name"])
+            result["status"] = "stored" if error is None else "failed"
+            if error is not None:
+                result["error"] = error
+            finish(result)
+        pending, pending_results, pending_bytes = [], [], 0
+
+    for display_name, pdf_name, read in sources:
+        file_start = time.perf_counter()
+        result = {"file": display_name, "pdf_name": pdf_name, "pages": 0, "chunks": 0}
+        if pdf_name in seen:
+            result.update({"status": "failed", "error": f"Duplicate PDF name {pdf_name!r}, already read from {seen[pdf_name]}"})
+            finish(result)
+            continue
+        seen[pdf_name] = display_name
+        try:
+            pdf_bytes = read()
+            file_hash = hash_file(pdf_bytes)
+            previous = get_stored_hashes(pdf_name)
+            if previous and previous["file_hash"] == file_hash:
+                result.update({"status": "unchanged", "seconds": round(time.perf_counter() - file_start, 3)})
+                finish(result)
+                continue
+
+            ingest_stats = {}
+            text_data = extract_pdf_text(pdf_bytes, stats=ingest_stats)
+            if not text_data:
+                raise ValueError("No text extracted - possible corrupted PDF")
+            page_hashes = hash_pages(text_data)
+            vectors = text_to_vector(text_data, batch_size=batch_size, stats=ingest_stats,
+                                     reuse=load_chunk_vectors(pdf_name) if previous else None)
+            result.update({
+                "pages": len(page_hashes),
+                "pages_changed": len(changed_pages(previous["page_hashes"], page_hashes)) if previous else len(page_hashes),
+                "chunks": len(vectors),
+                "chunks_reused": ingest_stats.get("chunks_reused", 0),
+                "words_removed": ingest_stats.get("words_removed", 0),
+                "chunks_deduplicated": ingest_stats.get("chunks_deduplicated", 0),
+                "bytes": len(pdf_bytes),
+                "seconds": round(time.perf_counter() - file_start, 3)
+            })
+            pending.append((pdf_name, pdf_bytes, vectors, extract_pdf_info(text_data), file_hash, page_hashes,
+                            ingest_stats))
+            pending_results.append(result)
+            pending_bytes += len(pdf_bytes)
+        except Exception as e:
+            print(f"Error processing {display_name}: {e}")
+            result.update({"status": "failed", "error": str(e)})
+            finish(result)
+            continue
+
+        if len(pending) >= write_batch or pending_bytes >= BULK_MAX_PENDING_BYTES:
+            flush()
+    flush()
+
+    elapsed = time.perf_counter() - start
+    stored = [r for r in results if r["status"] == "stored"]
+    total_chunks = sum(r["chunks"] for r in stored)
+    total_pages = sum(r["pages"] for r in stored)
+    return {
+        "files": len(results),
+        "stored": len(stored),
+        "unchanged": sum(1 for r in results if r["status"] == "unchanged"),
+        "failed": sum(1 for r in results if r["status"] == "failed"),
+        "pages": total_pages,
+        "chunks": total_chunks,
+        "seconds": round(elapsed, 3),
+        "files_per_second": round(len(stored) / elapsed, 2) if elapsed > 0 else 0.0,
+        "pages_per_second": round(total_pages / elapsed, 1) if elapsed > 0 else 0.0,
+        "chunks_per_second": round(total_chunks / elapsed, 1) if elapsed > 0 else 0.0,
+        "results": results
+    }
+
+def print_result(result: Dict):
+    if result["status"] == "stored":
+        print(f"stored  {result['file']}: {result['pages']} pages ({result['pages_changed']} changed), "
+              f"{result['chunks']} chunks ({result['chunks_reused']} reused, {result['chunks_deduplicated']} "
+              f"near-duplicates skipped), {result['words_removed']} boilerplate words removed in {result['seconds']}s")
+    elif result["status"] == "unchanged":
+        print(f"skipped {result['file']}: unchanged")
+    else:
+        print(f"failed  {result['file']}: {result.get('error')}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest many PDFs, zip archives or directories of them")
+    parser.add_argument("paths", nargs="+", help="PDF files, zip archives or directories")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="chunks per embedding batch")
+    parser.add_argument("--write-batch", type=int, default=BULK_WRITE_BATCH, help="documents per DB transaction")
+    parser.add_argument("--json", action="store_true", help="print the full summary as JSON")
+    args = parser.parse_args()
+
+    create_tables()
+    summary = ingest_sources(path_sources(args.paths), args.batch_size, args.write_batch,
+                             on_result=None if args.json else print_result)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(f"{summary['stored']}/{summary['files']} files stored, {summary['unchanged']} unchanged, {summary['chunks']} chunks "
+              f"in {summary['seconds']}s ({summary['files_per_second']} files/s, "
+              f"{summary['pages_per_second']} pages/s, {summary['chunks_per_second']} chunks/s)")
+    # Running servers reload changed PDFs when the corpus version moves; each stored batch has
+    # bumped it already, this confirms the last bump reached Redis
+    if summary["stored"] and not semantic_cache.bump_corpus_version():
+        print("Warning: could not bump the corpus version in Redis; restart running backends "
+              "to serve the new PDFs and drop cached answers", file=sys.stderr)
@@ -0,0 +1,185 @@
+import os
+import threading
+import time
+from typing import Dict
+from psycopg2 import extensions, pool
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Database Configuration
+DB_CONFIG = {
+    "dbname": os.getenv("POSTGRES_DB", "gcn-legacy"),
+    "user": os.getenv("POSTGRES_USER", "postgres"),
+    "password": os.getenv("POSTGRES_PASSWORD", "12345"),
+    "host": os.getenv("POSTGRES_HOST", "172.19.171.58"),
+    "port": os.getenv("POSTGRES_PORT", "5432")
+}
+
+# Pool configuration
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+DB_HEALTHCHECK_INTERVAL = float(os.getenv("DB_HEALTHCHECK_INTERVAL", "30"))  # idle seconds before re-checking
+
+class PoolTimeout(pool.PoolError):
+    """Raised when no connection becomes free within DB_POOL_TIMEOUT."""
+
+class ConnectionPool:
+    """Thread-safe Postgres pool that blocks when saturated and health-checks idle connections."""
+
+    def __init__(self, minconn: int = DB_POOL_MIN, maxconn: int = DB_POOL_MAX,
+                 timeout: float = DB_POOL_TIMEOUT, healthcheck_interval: float = DB_HEALTHCHECK_INTERVAL,
+                 **config):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_interval = healthcheck_interval
+        self._config = config
+        self._pool = None
+        self._init_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        # ThreadedConnectionPool raises when exhausted; the semaphore makes callers wait instead
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used: Dict[int, float] = {}
+        self._stats = {
+            "acquired": 0,
+            "waited": 0,
+            "timeouts": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+            "in_use": 0,
+            "peak_in_use": 0,
+            "healthcheck_failures": 0
+        }
+
+    def _get_pool(self) -> pool.ThreadedConnectionPool:
+        if self._pool is None:
+            with self._init_lock:
+                if self._pool is None:
+                    self._pool = pool.ThreadedConnectionPool(self.minconn, self.maxconn, **self._config)
+        return self._pool
+
+    def _is_healthy(self, conn) -> bool:
+        """Cheap check for connections that are closed or have sat idle for a while."""
+        if conn.closed:
+            return False
+        if time.monotonic() - self._last_used.get(id(conn), 0.0) < self.healthcheck_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self):
+        """Borrow a healthy connection, waiting up to `timeout` seconds if the pool is saturated."""
+        start = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            if not self._slots.acquire(timeout=self.timeout):
+                with self._stats_lock:
+                    self._stats["timeouts"] += 1
+                raise PoolTimeout(f"No database connection available after {self.timeout}s")
+            with self._stats_lock:
+                self._stats["waited"] += 1
+        wait = time.monotonic() - start
+
+        try:
+            db_pool = self._get_pool()
+            conn = db_pool.getconn()
+            if not self._is_healthy(conn):
+                with self._stats_lock:
+                    self._stats["healthcheck_failures"] += 1
+                db_pool.putconn(conn, close=True)
+                conn = db_pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._stats_lock:
+            self._stats["acquired"] += 1
+            self._stats["total_wait_seconds"] += wait
+            self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], wait)
+            self._stats["in_use"] += 1
+            self._stats["peak_in_use"] = max(self._stats["peak_in_use"], self._stats["in_use"])
+        return conn
+
+    def putconn(self, conn):
+        """Return a connection, rolling back anything the caller left open."""
+        try:
+            close = bool(conn.closed)
+            if not close and conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except Exception:
+                    close = True
+            if close:
+                self._last_used.pop(id(conn), None)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+            self._get_pool().putconn(conn, close=close)
+        finally:
+            with self._stats_lock:
+                self._stats["in_use"] -= 1
+            self._slots.release()
+
+    def stats(self) -> Dict:
+        """Snapshot of pool size, saturation and wait-time metrics."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        acquired = stats["acquired"]
+        stats.update({
+            "min_size": self.minconn,
+            "max_size": self.maxconn,
+            "saturation": stats["in_use"] / self.maxconn,
+            "avg_wait_seconds": stats["total_wait_seconds"] / acquired if acquired else 0.0
+        })
+        return stats
+
+    def closeall(self):
+        """Close every pooled connection."""
+        if self._pool is not None:
+            self._pool.closeall()
+
+class PooledConnection:
+    """Proxy for a borrowed connection whose close() hands it back to the pool."""
+
+    def __init__(self, db_pool: ConnectionPool):
+        self._pool = db_pool
+        self._conn = None
+        self._conn = db_pool.getconn()
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.putconn(conn)
+
+    def __enter__(self) -> "PooledConnection":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Unlike a psycopg2 connection's own context manager this ends the borrow, not just the
+        # transaction: anything left uncommitted is rolled back as the connection goes back
+        self.close()
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise pool.PoolError("connection already returned to the pool")
+        return getattr(self._conn, name)
+
+    def __del__(self):
+        # Safety net for code paths that forget to close
+        try:
+            self.close()
+        except Exception:
+            pass
+
+# Process-wide pool shared by every DB function in the backend
+db_pool = ConnectionPool(**DB_CONFIG)
+
+def get_db_connection() -> PooledConnection:
+    """Borrow a connection from the shared pool; close() returns it."""
+    return PooledConnection(db_pool)
@@ -0,0 +1,165 @@
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Union
+import numpy as np
+import redis
+import model_registry
+from embedding_store import EMBEDDING_DTYPE
+from llm_cache import REDIS_HOST, REDIS_PORT
+
+# In-process tier size (number of vectors; about 1.5 KB each for a 384-dimensional model)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "20000"))
+# Seconds a vector stays in Redis; entries are keyed by model version, so they never go stale
+EMBEDDING_CACHE_TTL = int(os.getenv("EMBEDDING_CACHE_TTL", str(7 * 86400)))
+
+KEY_PREFIX = "emb"
+
+def normalize_text(text: str) -> str:
+    """Unicode-normalize and collapse whitespace, so trivially different copies share a key."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+def cache_key(model_version: str, text: str) -> str:
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{KEY_PREFIX}:{model_version}:{digest}"
+
+class EmbeddingCache:
+    """Two-tier embedding cache: an in-process LRU in front of Redis, keyed by model and text."""
+
+    def __init__(self, max_entries: int = EMBEDDING_CACHE_SIZE, redis_client: Optional[redis.Redis] = None,
+                 ttl: int = EMBEDDING_CACHE_TTL):
+        self.max_entries = max_entries
+        self.redis = redis_client
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, kind: str, field: str, amount: int = 1):
+        if not amount:
+            return
+        with self._lock:
+            counters = self._stats.setdefault(
+                kind, {"memory_hits": 0, "redis_hits": 0, "misses": 0, "errors": 0}
+            )
+            counters[field] += amount
+
+    def _remember(self, key: str, vector: np.ndarray):
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _lookup_memory(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vector
+        return found
+
+    def _lookup_redis(self, keys: List[str], kind: str) -> Dict[str, np.ndarray]:
+        if self.redis is None or not keys:
+            return {}
+        try:
+            blobs = self.redis.mget(keys)
+        except Exception as e:
+            print(f"Error reading embedding cache: {e}")
+            self._count(kind, "errors")
+            return {}
+        found = {}
+        for key, blob in zip(keys, blobs):
+            if blob is not None:
+                found[key] = np.frombuffer(blob, dtype=EMBEDDING_DTYPE)
+                self._remember(key, found[key])
+        return found
+
+    def _store_redis(self, vectors: Dict[str, np.ndarray], kind: str):
+        if self.redis is None or not vectors or self.ttl <= 0:
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for key, vector in vectors.items():
+                pipe.set(key, vector.tobytes(), ex=self.ttl)
+            pipe.execute()
+        except Exception as e:
+            print(f"Error writing embedding cache: {e}")
+            self._count(kind, "errors")
+
+    def encode(self, sentences: Union[str, List[str]], name: str = model_registry.DEFAULT_MODEL_NAME,
+               batch_size: int = 32, kind: str = "default") -> np.ndarray:
+        """Embeddings for one text (1-D) or a list of texts (2-D), encoding only uncached ones.
+
+        kind labels the caller ("query", "chunk", "web", ...) in the hit-rate stats.
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.empty((0, 0), dtype=EMBEDDING_DTYPE)
+
+        version = model_registry.model_version(name)
+        keys = [cache_key(version, text) for text in texts]
+        unique_keys = list(dict.fromkeys(keys))
+
+        found = self._lookup_memory(unique_keys)
+        self._count(kind, "memory_hits", len(found))
+        from_redis = self._lookup_redis([key for key in unique_keys if key not in found], kind)
+        self._count(kind, "redis_hits", len(from_redis))
+        found.update(from_redis)
+
+        # One forward pass for every distinct text neither tier had
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            self._count(kind, "misses", len(missing))
+            encoded = model_registry.encode(list(missing.values()), name=name, batch_size=batch_size,
+                                            convert_to_numpy=True)
+            new_vectors = {key: np.asarray(vector, dtype=EMBEDDING_DTYPE)
+                           for key, vector in zip(missing, encoded)}
+            for key, vector in new_vectors.items():
+                self._remember(key, vector)
+            self._store_redis(new_vectors, kind)
+            found.update(new_vectors)
+
+        matrix = np.stack([found[key] for key in keys])
+        return matrix[0] if single else matrix
+
+    def clear(self):
+        """Drop the in-process tier; Redis entries expire on their own."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters per caller kind plus totals."""
+        with self._lock:
+            by_kind = {kind: dict(counters) for kind, counters in self._stats.items()}
+            size = len(self._entries)
+        hits = sum(c["memory_hits"] + c["redis_hits"] for c in by_kind.values())
+        misses = sum(c["misses"] for c in by_kind.values())
+        for counters in by_kind.values():
+            lookups = counters["memory_hits"] + counters["redis_hits"] + counters["misses"]
+            counters["hit_rate"] = (lookups - counters["misses"]) / lookups if lookups else 0.0
+        return {
+            "memory_entries": size,
+            "max_entries": self.max_entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "by_kind": by_kind
+        }
+
+# Process-wide cache; vectors are stored as raw float32 bytes, so responses are not decoded
+embedding_cache = EmbeddingCache(redis_client=redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0))
+
+def encode(sentences: Union[str, List[str]], name: str = model_registry.DEFAULT_MODEL_NAME,
+           batch_size: int = 32, kind: str = "default") -> np.ndarray:
+    """model_registry.encode through the process-wide embedding cache."""
+    return embedding_cache.encode(sentences, name=name, batch_size=batch_size, kind=kind)
@@ -0,0 +1,50 @@
+import json
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+# Embeddings are stored as a contiguous little-endian float32 matrix, one row per chunk
+EMBEDDING_DTYPE = np.dtype('<f4')
+
+def vectors_to_matrix(vectors: List[Dict]) -> np.ndarray:
+    """Stack the 'vector' field of each chunk into a float32 matrix."""
+    if not vectors:
+        return np.empty((0, 0), dtype=EMBEDDING_DTYPE)
+    return np.asarray([v['vector'] for v in vectors], dtype=EMBEDDING_DTYPE)
+
+def blob_to_matrix(blob, dim: int) -> np.ndarray:
+    """Read an embeddings BYTEA value back into an (n_chunks, dim) float32 matrix without copying."""
+    if blob is None or not dim:
+        return np.empty((0, 0), dtype=EMBEDDING_DTYPE)
+    return np.frombuffer(blob, dtype=EMBEDDING_DTYPE).reshape(-1, dim)
+
+def strip_vectors(vectors: List[Dict]) -> List[Dict]:
+    """Chunk metadata (text and page range) without the vectors themselves."""
+    return [{"text": v['text'], "page_number": v['page_number']} for v in vectors]
+
+def decode_document(text_vectors, embeddings, embedding_dim: Optional[int]) -> Tuple[np.ndarray, List[Dict]]:
+    """Return (matrix, chunk metadata) for a pdfdata row in either the binary or legacy JSON layout."""
+    chunks = json.loads(text_vectors) if isinstance(text_vectors, str) else (text_vectors or [])
+    if embeddings is not None:
+        return blob_to_matrix(embeddings, embedding_dim), chunks
+
+    # Legacy row: vectors are still embedded in the JSON chunk list
+    return vectors_to_matrix(chunks), strip_vectors(chunks)
+
+def parse_page_range(page_str: str) -> Tuple[int, int]:
+    """Split a "3" or "3-5" page string into (page_start, page_end)."""
+    if '-' in page_str:
+        start, end = page_str.split('-', 1)
+        return int(start), int(end)
+    return int(page_str), int(page_str)
+
+def format_page_range(page_start: int, page_end: int) -> str:
+    """Inverse of parse_page_range."""
+    return str(page_start) if page_start == page_end else f"{page_start}-{page_end}"
+
+def vector_to_blob(vector) -> bytes:
+    """Serialize a single chunk vector for the pdf_chunks.embedding column."""
+    return np.asarray(vector, dtype=EMBEDDING_DTYPE).tobytes()
+
+def blob_to_vector(blob) -> np.ndarray:
+    """Read a pdf_chunks.embedding value back into a float32 vector."""
+    return np.frombuffer(blob, dtype=EMBEDDING_DTYPE)
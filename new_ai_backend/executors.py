@@ -0,0 +1,48 @@
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Executor for CPU-bound embedding and similarity work. Torch and NumPy release the GIL
+# inside their kernels, so threads scale here; keeping it separate from the default
+# executor stops slow LLM calls from starving retrieval and vice versa.
+CPU_EXECUTOR_WORKERS = int(os.getenv("CPU_EXECUTOR_WORKERS", str(min(4, os.cpu_count() or 1))))
+cpu_executor = ThreadPoolExecutor(max_workers=CPU_EXECUTOR_WORKERS, thread_name_prefix="cpu-worker")
+
+# Event-loop lag sampling
+LOOP_LAG_INTERVAL = 0.5  # seconds between samples
+
+loop_lag_stats = {
+    "samples": 0,
+    "total_lag_seconds": 0.0,
+    "max_lag_seconds": 0.0,
+    "last_lag_seconds": 0.0
+}
+
+async def run_cpu(func, *args, **kwargs):
+    """Run a blocking CPU-bound call on the dedicated executor and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cpu_executor, functools.partial(func, *args, **kwargs))
+
+async def monitor_loop_lag(interval: float = LOOP_LAG_INTERVAL):
+    """Measure how late the event loop wakes up from a fixed sleep, forever."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - start - interval)
+        loop_lag_stats["samples"] += 1
+        loop_lag_stats["total_lag_seconds"] += lag
+        loop_lag_stats["max_lag_seconds"] = max(loop_lag_stats["max_lag_seconds"], lag)
+        loop_lag_stats["last_lag_seconds"] = lag
+
+def get_executor_stats() -> dict:
+    """Executor size and backlog together with event-loop lag."""
+    samples = loop_lag_stats["samples"]
+    return {
+        "cpu_workers": CPU_EXECUTOR_WORKERS,
+        "cpu_queue_size": cpu_executor._work_queue.qsize(),
+        "loop_lag_avg_seconds": loop_lag_stats["total_lag_seconds"] / samples if samples else 0.0,
+        "loop_lag_max_seconds": loop_lag_stats["max_lag_seconds"],
+        "loop_lag_last_seconds": loop_lag_stats["last_lag_seconds"]
+    }
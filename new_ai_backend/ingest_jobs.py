@@ -0,0 +1,430 @@
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from typing import Dict, List, Optional
+import psycopg2
+from db import get_db_connection
+from upload_pdf import (
+    changed_pages,
+    extract_pdf_info,
+    extract_pdf_text,
+    get_stored_hashes,
+    hash_file,
+    hash_pages,
+    load_chunk_vectors,
+    store_in_database,
+    text_to_vector,
+)
+
+# Ingestion jobs running at once in this process; embedding is serialized per model anyway,
+# so more workers mostly overlap PDF extraction and database writes
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_POLL_INTERVAL = float(os.getenv("INGEST_POLL_INTERVAL", "5"))  # seconds between idle queue checks
+# Live workers refresh the heartbeat (updated_at) of their running jobs this often, so a
+# running job whose heartbeat is older than INGEST_STALE_SECONDS belonged to a worker that died
+INGEST_HEARTBEAT_INTERVAL = float(os.getenv("INGEST_HEARTBEAT_INTERVAL", "15"))
+INGEST_STALE_SECONDS = float(os.getenv("INGEST_STALE_SECONDS", "60"))
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "3"))
+PROGRESS_INTERVAL = 1.0  # seconds between progress writes
+
+JOB_COLUMNS = [
+    "job_id", "pdf_name", "status", "stage", "pages_extracted", "total_pages",
+    "chunks_embedded", "total_chunks", "stored", "chunks_per_second", "error",
+    "attempts", "created_at", "started_at", "finished_at"
+]
+
+class IngestError(Exception):
+    """A PDF that cannot be ingested; the job fails without a retry."""
+
+def create_job_table():
+    """Create the persistent ingestion queue if it doesn't exist"""
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS ingest_jobs (
+                job_id TEXT PRIMARY KEY,
+                pdf_name TEXT NOT NULL,
+                pdf_file BYTEA,
+                status TEXT NOT NULL DEFAULT 'queued',
+                stage TEXT,
+                pages_extracted INTEGER NOT NULL DEFAULT 0,
+                total_pages INTEGER,
+                chunks_embedded INTEGER NOT NULL DEFAULT 0,
+                total_chunks INTEGER,
+                stored BOOLEAN NOT NULL DEFAULT FALSE,
+                chunks_per_second REAL,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker_id TEXT,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                started_at TIMESTAMPTZ,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                finished_at TIMESTAMPTZ
+            )
+        """)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS ingest_jobs_status_idx ON ingest_jobs (status, created_at)
+        """)
+        conn.commit()
+    except Exception as e:
+        print(f"Error creating ingest_jobs table: {e}")
+        conn.rollback()
+    finally:
+        cur.close()
+        conn.close()
+
+def job_to_dict(row: tuple) -> Dict:
+    job = dict(zip(JOB_COLUMNS, row))
+    for field in ("created_at", "started_at", "finished_at"):
+        if job[field] is not None:
+            job[field] = job[field].isoformat()
+    return job
+
+def enqueue_job(pdf_name: str, pdf_bytes: bytes) -> str:
+    """Persist an uploaded PDF as a queued job and return its id."""
+    job_id = uuid.uuid4().hex
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("""
+            INSERT INTO ingest_jobs (job_id, pdf_name, pdf_file) VALUES (%s, %s, %s)
+        """, (job_id, pdf_name, psycopg2.Binary(pdf_bytes)))
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+    ingest_pool.notify()
+    return job_id
+
+def get_job(job_id: str) -> Optional[Dict]:
+    """Status and progress of one job."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM ingest_jobs WHERE job_id = %s", (job_id,))
+        row = cur.fetchone()
+        return job_to_dict(row) if row else None
+    finally:
+        cur.close()
+        conn.close()
+
+def list_jobs(status: Optional[str] = None, limit: int = 50) -> List[Dict]:
+    """Most recent jobs, optionally filtered by status."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        if status:
+            cur.execute(f"""
+                SELECT {', '.join(JOB_COLUMNS)} FROM ingest_jobs
+                WHERE status = %s ORDER BY created_at DESC LIMIT %s
+            """, (status, limit))
+        else:
+            cur.execute(f"""
+                SELECT {', '.join(JOB_COLUMNS)} FROM ingest_jobs
+                ORDER BY created_at DESC LIMIT %s
+            """, (limit,))
+        return [job_to_dict(row) for row in cur.fetchall()]
+    finally:
+        cur.close()
+        conn.close()
+
+def queue_counts() -> Dict[str, int]:
+    """Number of jobs per status."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("SELECT status, COUNT(*) FROM ingest_jobs GROUP BY status")
+        return {status: count for status, count in cur.fetchall()}
+    finally:
+        cur.close()
+        conn.close()
+
+def claim_job(worker_id: str) -> Optional[tuple]:
+    """Atomically take the oldest queued job; concurrent workers skip rows another has locked."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("""
+            UPDATE ingest_jobs
+            SET status = 'running', stage = 'extracting', attempts = attempts + 1,
+                worker_id = %s, started_at = now(), updated_at = now()
+            WHERE job_id = (
+                SELECT job_id FROM ingest_jobs
+                WHERE status = 'queued'
+                ORDER BY created_at
+                FOR UPDATE SKIP LOCKED
+                LIMIT 1
+            )
+            RETURNING job_id, pdf_name, pdf_file
+        """, (worker_id,))
+        row = cur.fetchone()
+        conn.commit()
+        if not row:
+            return None
+        return row[0], row[1], bytes(row[2])
+    finally:
+        cur.close()
+        conn.close()
+
+def update_job(job_id: str, **fields):
+    """Set progress columns and refresh the job's heartbeat."""
+    assignments = ", ".join(f"{name} = %s" for name in fields)
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute(f"""
+            UPDATE ingest_jobs SET {assignments}{', ' if fields else ''}updated_at = now()
+            WHERE job_id = %s
+        """, (*fields.values(), job_id))
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+def heartbeat_jobs(worker_id: str) -> int:
+    """Refresh the heartbeat of every job this worker is running, however long its current step takes."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("""
+            UPDATE ingest_jobs SET updated_at = now()
+            WHERE status = 'running' AND worker_id = %s
+        """, (worker_id,))
+        conn.commit()
+        return cur.rowcount
+    finally:
+        cur.close()
+        conn.close()
+
+def finish_job(job_id: str, error: Optional[str] = None, chunks_per_second: Optional[float] = None):
+    """Mark a job done, dropping its copy of the PDF, or failed with an error message."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        if error is None:
+            cur.execute("""
+                UPDATE ingest_jobs
+                SET status = 'done', stage = NULL, stored = TRUE, chunks_per_second = %s,
+                    pdf_file = NULL, finished_at = now(), updated_at = now()
+                WHERE job_id = %s
+            """, (chunks_per_second, job_id))
+        else:
+            cur.execute("""
+                UPDATE ingest_jobs
+                SET status = 'failed', error = %s, finished_at = now(), updated_at = now()
+                WHERE job_id = %s
+            """, (error, job_id))
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+def requeue_jobs(worker_id: Optional[str] = None, stale_seconds: float = INGEST_STALE_SECONDS) -> int:
+    """Put running jobs back in the queue: those of worker_id, or any whose heartbeat is stale.
+
+    Jobs that have already been attempted INGEST_MAX_ATTEMPTS times are failed instead.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        condition = "worker_id = %s" if worker_id else "updated_at < now() - make_interval(secs => %s)"
+        cur.execute(f"""
+            UPDATE ingest_jobs
+            SET status = CASE WHEN attempts >= %s THEN 'failed' ELSE 'queued' END,
+                error = CASE WHEN attempts >= %s THEN 'Worker stopped while processing' ELSE error END,
+                stage = NULL, worker_id = NULL, updated_at = now()
+            WHERE status = 'running' AND {condition}
+        """, (INGEST_MAX_ATTEMPTS, INGEST_MAX_ATTEMPTS, worker_id or stale_seconds))
+        requeued = cur.rowcount
+        conn.commit()
+        if requeued:
+            print(f"Requeued {requeued} interrupted ingestion jobs")
+        return requeued
+    finally:
+        cur.close()
+        conn.close()
+
+class JobProgress:
+    """Throttled writer for a job's page and chunk counters."""
+
+    def __init__(self, job_id: str, interval: float = PROGRESS_INTERVAL):
+        self.job_id = job_id
+        self.interval = interval
+        self._pending: Dict = {}
+        self._last_write = 0.0
+
+    def _report(self, **fields):
+        self._pending.update(fields)
+        if time.monotonic() - self._last_write >= self.interval:
+            self.flush()
+
+    def pages(self, done: int, total: int):
+        self._report(pages_extracted=done, total_pages=total)
+
+    def chunks(self, done: int, total: int):
+        self._report(chunks_embedded=done, total_chunks=total)
+
+    def flush(self, **fields):
+        self._pending.update(fields)
+        if self._pending:
+            update_job(self.job_id, **self._pending)
+            self._pending = {}
+        self._last_write = time.monotonic()
+
+def ingest_pdf(job_id: str, pdf_name: str, pdf_bytes: bytes) -> Dict:
+    """Extract, embed and store one PDF, recording progress on its job row.
+
+    Re-uploads of a stored PDF are incremental: an identical file is skipped and
+    chunks whose text already has a vector are not embedded again.
+    """
+    progress = JobProgress(job_id)
+
+    file_hash = hash_file(pdf_bytes)
+    previous = get_stored_hashes(pdf_name)
+    if previous and previous["file_hash"] == file_hash:
+        print(f"{pdf_name} is unchanged, skipping")
+        return {"unchanged": True}
+
+    # Process text
+    ingest_stats = {}
+    text_data = extract_pdf_text(pdf_bytes, progress_callback=progress.pages, stats=ingest_stats)
+    if not text_data:
+        raise IngestError("No text extracted - possible corrupted PDF")
+
+    # Generate info
+    pdf_info = extract_pdf_info(text_data)
+    page_hashes = hash_pages(text_data)
+    if previous:
+        print(f"{pdf_name}: {len(changed_pages(previous['page_hashes'], page_hashes))} of {len(page_hashes)} pages changed")
+
+    # Generate vectors
+    progress.flush(stage="embedding")
+    vectors = text_to_vector(text_data, progress_callback=progress.chunks, stats=ingest_stats,
+                             reuse=load_chunk_vectors(pdf_name) if previous else None)
+
+    # Store in database
+    progress.flush(stage="storing")
+    if not store_in_database(pdf_name, pdf_bytes, vectors, pdf_info, file_hash, page_hashes, ingest_stats):
+        raise IngestError("Failed to store PDF in database")
+    return ingest_stats
+
+class IngestWorkerPool:
+    """Threads that drain the ingest_jobs queue with bounded concurrency."""
+
+    def __init__(self, workers: int = INGEST_WORKERS, poll_interval: float = INGEST_POLL_INTERVAL):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._threads: List[threading.Thread] = []
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._stats = {"active": 0, "completed": 0, "failed": 0}
+
+    def start(self):
+        """Requeue jobs orphaned by a previous run and start the worker and heartbeat threads.
+
+        Jobs still marked as running under this worker id (a restarted process that got the
+        same pid) are orphans for certain; other workers' jobs are once their heartbeat is stale.
+        """
+        if self._threads:
+            return
+        try:
+            requeue_jobs(worker_id=self.worker_id)
+            requeue_jobs()
+        except Exception as e:
+            print(f"Error requeuing ingestion jobs: {e}")
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"ingest-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat, name="ingest-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        """Stop taking new jobs; jobs still running are handed back to the queue."""
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        try:
+            requeue_jobs(worker_id=self.worker_id)
+        except Exception as e:
+            print(f"Error requeuing ingestion jobs: {e}")
+
+    def notify(self):
+        """Wake idle workers after a job is enqueued."""
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                job = claim_job(self.worker_id)
+            except Exception as e:
+                print(f"Error claiming ingestion job: {e}")
+                job = None
+            if job is None:
+                if self._wakeup.wait(self.poll_interval):
+                    self._wakeup.clear()
+                else:
+                    # Idle: pick up jobs whose worker died without handing them back
+                    try:
+                        requeue_jobs()
+                    except Exception as e:
+                        print(f"Error requeuing ingestion jobs: {e}")
+                continue
+            self._process(*job)
+
+    def _heartbeat(self):
+        while not self._stopping.wait(INGEST_HEARTBEAT_INTERVAL):
+            try:
+                heartbeat_jobs(self.worker_id)
+            except Exception as e:
+                print(f"Error refreshing ingestion job heartbeats: {e}")
+
+    def _process(self, job_id: str, pdf_name: str, pdf_bytes: bytes):
+        with self._stats_lock:
+            self._stats["active"] += 1
+        print(f"Ingesting {pdf_name} (job {job_id})")
+        try:
+            stats = ingest_pdf(job_id, pdf_name, pdf_bytes)
+            finish_job(job_id, chunks_per_second=stats.get("chunks_per_second"))
+            outcome = "completed"
+            print(f"Successfully processed: {pdf_name}")
+        except Exception as e:
+            print(f"Error processing PDF {pdf_name}: {str(e)}")
+            if not isinstance(e, IngestError):
+                traceback.print_exc()
+            try:
+                finish_job(job_id, error=str(e) or type(e).__name__)
+            except Exception as db_error:
+                print(f"Error recording failed job {job_id}: {db_error}")
+            outcome = "failed"
+        with self._stats_lock:
+            self._stats["active"] -= 1
+            self._stats[outcome] += 1
+
+    def stats(self) -> Dict:
+        """Worker count and the jobs this process has handled."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update({"workers": self.workers, "worker_id": self.worker_id})
+        return stats
+
+# Process-wide pool started with the API server
+ingest_pool = IngestWorkerPool()
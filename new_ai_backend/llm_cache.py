@@ -0,0 +1,138 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+import redis
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Redis tier shared by every backend process
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6380"))
+
+# In-process tier size (number of responses)
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+
+# Seconds a response stays cached, per kind of prompt. Query rewrites and chat names are
+# stable; answers and suggestions go stale as the PDF corpus and web results change.
+DEFAULT_TTL = int(os.getenv("LLM_CACHE_TTL", "3600"))
+PROMPT_TTLS = {
+    "search_query": 86400,
+    "query_optimizer": 86400,
+    "chat_name": 86400,
+    "related_queries": 3600,
+    "final_answer": 3600,
+}
+
+KEY_PREFIX = "llm"
+
+def cache_key(model: str, sys_prompt: str, user_prompt: str) -> str:
+    """Content address of one LLM request: model, system-prompt hash and user prompt."""
+    sys_hash = hashlib.sha256(sys_prompt.encode("utf-8")).hexdigest()
+    digest = hashlib.sha256(f"{model}\0{sys_hash}\0{user_prompt}".encode("utf-8")).hexdigest()
+    return f"{KEY_PREFIX}:{digest}"
+
+def prompt_ttl(prompt_type: str) -> int:
+    return PROMPT_TTLS.get(prompt_type, DEFAULT_TTL)
+
+class LLMCache:
+    """Two-tier response cache: an in-process LRU in front of Redis."""
+
+    def __init__(self, max_entries: int = LLM_CACHE_SIZE, redis_client: Optional[redis.Redis] = None):
+        self.max_entries = max_entries
+        self.redis = redis_client
+        # key -> (response, monotonic time it expires at)
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, prompt_type: str, field: str):
+        with self._lock:
+            counters = self._stats.setdefault(
+                prompt_type, {"memory_hits": 0, "redis_hits": 0, "misses": 0, "stores": 0, "errors": 0}
+            )
+            counters[field] += 1
+
+    def _remember(self, key: str, value: str, ttl: float):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str, prompt_type: str = "default") -> Optional[str]:
+        """Cached response for a key, or None. Redis hits are promoted into the LRU tier for
+        the rest of their Redis TTL."""
+        value = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > time.monotonic():
+                    value = entry[0]
+                    self._entries.move_to_end(key)
+                else:
+                    del self._entries[key]
+        if value is not None:
+            self._count(prompt_type, "memory_hits")
+            return value
+
+        if self.redis is not None:
+            remaining = -1
+            try:
+                pipe = self.redis.pipeline()
+                pipe.get(key)
+                pipe.ttl(key)
+                value, remaining = pipe.execute()
+            except Exception as e:
+                print(f"Error reading LLM cache: {e}")
+                self._count(prompt_type, "errors")
+            if value is not None:
+                # A negative TTL means the key has no expiry in Redis
+                self._remember(key, value, remaining if remaining > 0 else prompt_ttl(prompt_type))
+                self._count(prompt_type, "redis_hits")
+                return value
+
+        self._count(prompt_type, "misses")
+        return None
+
+    def set(self, key: str, value: str, prompt_type: str = "default"):
+        """Store a response in both tiers with the TTL for its prompt type."""
+        ttl = prompt_ttl(prompt_type)
+        if not value or ttl <= 0:
+            return
+        self._remember(key, value, ttl)
+        self._count(prompt_type, "stores")
+        if self.redis is not None:
+            try:
+                self.redis.set(key, value, ex=ttl)
+            except Exception as e:
+                print(f"Error writing LLM cache: {e}")
+                self._count(prompt_type, "errors")
+
+    def clear(self):
+        """Drop the in-process tier; Redis entries expire on their own."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters per prompt type plus totals."""
+        with self._lock:
+            by_type = {name: dict(counters) for name, counters in self._stats.items()}
+            size = len(self._entries)
+        hits = sum(c["memory_hits"] + c["redis_hits"] for c in by_type.values())
+        misses = sum(c["misses"] for c in by_type.values())
+        return {
+            "memory_entries": size,
+            "max_entries": self.max_entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "by_prompt_type": by_type
+        }
+
+# Process-wide cache used by ollama_chat
+llm_cache = LLMCache(redis_client=redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True))
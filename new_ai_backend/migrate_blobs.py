@@ -0,0 +1,19 @@
+import argparse
+from blob_store import blob_store
+from upload_pdf import create_tables, migrate_to_blob_store, referenced_blobs
+
+# Moves original PDFs out of pdfdata.pdf_file into the blob store at BLOB_STORE_DIR.
+# Can be run against a live database; --gc afterwards deletes blobs no row references.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move stored PDFs into the blob store")
+    parser.add_argument("--gc", action="store_true", help="also delete unreferenced blobs")
+    args = parser.parse_args()
+
+    create_tables()
+    migrated = migrate_to_blob_store()
+    print(f"Migrated {migrated} PDFs to {blob_store.root}")
+    if migrated:
+        print("Run VACUUM FULL pdfdata to return the freed space to the filesystem")
+    if args.gc:
+        deleted = blob_store.collect_garbage(referenced_blobs())
+        print(f"Deleted {deleted} unreferenced blobs")
@@ -0,0 +1,8 @@
+from upload_pdf import create_tables, migrate_to_chunk_table
+
+# Converts pdfdata rows that still hold per-document vectors (JSON or binary) into pdf_chunks.
+# Can be run against a live database; rerun until it reports nothing left to migrate.
+if __name__ == "__main__":
+    create_tables()
+    migrated = migrate_to_chunk_table()
+    print(f"Migrated {migrated} PDFs to pdf_chunks")
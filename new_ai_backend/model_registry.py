@@ -0,0 +1,48 @@
+import os
+import threading
+from typing import Dict
+import sentence_transformers
+from sentence_transformers import SentenceTransformer
+
+# Embedding model used for PDF chunks, queries and scraped pages
+DEFAULT_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+
+# One instance per model name for the whole process
+_models: Dict[str, SentenceTransformer] = {}
+# Fast tokenizers are not safe to call from several threads at once, so encode calls are serialized
+# per model; torch still parallelizes each forward pass internally.
+_encode_locks: Dict[str, threading.Lock] = {}
+_load_lock = threading.Lock()
+
+def get_model(name: str = DEFAULT_MODEL_NAME) -> SentenceTransformer:
+    """Return the shared instance of a model, loading it on first use."""
+    model = _models.get(name)
+    if model is None:
+        with _load_lock:
+            model = _models.get(name)
+            if model is None:
+                print(f"Loading embedding model {name}")
+                model = SentenceTransformer(name)
+                _encode_locks[name] = threading.Lock()
+                _models[name] = model
+    return model
+
+def encode(sentences, name: str = DEFAULT_MODEL_NAME, **kwargs):
+    """Thread-safe SentenceTransformer.encode on the shared model."""
+    model = get_model(name)
+    with _encode_locks[name]:
+        return model.encode(sentences, **kwargs)
+
+def model_version(name: str = DEFAULT_MODEL_NAME) -> str:
+    """Identifier stored alongside vectors so they can be checked against the loaded model."""
+    return f"{name}@sentence-transformers-{sentence_transformers.__version__}"
+
+def model_info(name: str = DEFAULT_MODEL_NAME) -> Dict:
+    """Name, version and embedding size of a model, plus whether it is loaded yet."""
+    model = _models.get(name)
+    return {
+        "name": name,
+        "version": model_version(name),
+        "dimension": model.get_sentence_embedding_dimension() if model else None,
+        "loaded": model is not None
+    }
@@ -1,42 +1,224 @@
+import asyncio
 import json
-from typing import Dict, Any, Optional
+from typing import Any, AsyncIterator, Dict, Optional
+import os
+import random
+import threading
 import time
+import httpx
 import openai
-import os
+from dotenv import load_dotenv
+from llm_cache import cache_key, llm_cache
+
+# Load environment variables
+load_dotenv()
+
+# LLM endpoint configuration
+LLM_API_KEY = os.getenv("OPENROUTER_API_KEY", "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")
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://openrouter.ai/api/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "meta-llama/llama-3.3-70b-instruct:free")
+
+# Connection pool and retry configuration
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))  # seconds
+RETRY_BASE_DELAY = 1.0  # seconds
+RETRY_MAX_DELAY = 10.0  # seconds
+
+# Errors that will not go away by retrying the same request
+NON_RETRYABLE_ERRORS = (
+    openai.AuthenticationError,
+    openai.PermissionDeniedError,
+    openai.BadRequestError,
+    openai.NotFoundError,
+)
+
+_client: Optional[openai.OpenAI] = None
+_client_lock = threading.Lock()
+_async_client: Optional[openai.AsyncOpenAI] = None
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+    )
+
+def get_client() -> openai.OpenAI:
+    """Return the process-wide LLM client, whose HTTP connections are kept alive between calls."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                http_client = httpx.Client(limits=_http_limits(), timeout=LLM_TIMEOUT)
+                # Retries are handled in chat_ollama so they share one backoff policy
+                _client = openai.OpenAI(
+                    api_key=LLM_API_KEY,
+                    base_url=LLM_BASE_URL,
+                    http_client=http_client,
+                    max_retries=0,
+                )
+    return _client
+
+def get_async_client() -> openai.AsyncOpenAI:
+    """Return the async LLM client; it lives on the event loop that first uses it."""
+    global _async_client
+    if _async_client is None:
+        _async_client = openai.AsyncOpenAI(
+            api_key=LLM_API_KEY,
+            base_url=LLM_BASE_URL,
+            http_client=httpx.AsyncClient(limits=_http_limits(), timeout=LLM_TIMEOUT),
+            max_retries=0,
+        )
+    return _async_client
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter for the given 0-based retry attempt."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
 
-def chat_ollama(sys_prompt: str, user_prompt: str, model: str = "gemma3:4b-it-qat", max_retries: int = 3) -> str:
+def chat_ollama(sys_prompt: str, user_prompt: str, model: str = "gemma3:4b-it-qat", max_retries: int = 3,
+                prompt_type: str = "default") -> str:
     """
-    Chat with Ollama model with retries and better error handling.
+    Chat with the configured LLM with retries and better error handling.
+    Responses are cached by prompt content; `prompt_type` selects the cache TTL.
     """
+    key = cache_key(LLM_MODEL, sys_prompt, user_prompt)
+    cached = llm_cache.get(key, prompt_type)
+    if cached is not None:
+        return cached
+
     for attempt in range(max_retries):
         try:
-            client = openai.OpenAI(
-                api_key="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",
-                base_url="https://openrouter.ai/api/v1",
-            )
-
-            response = client.chat.completions.create(
-                model="meta-llama/llama-3.3-70b-instruct:free",
+            response = get_client().chat.completions.create(
+                model=LLM_MODEL,
                 messages=[
                     {"role": "system", "content": sys_prompt},
                     {"role": "user", "content": user_prompt},
                 ]
             )
 
-            time.sleep(1)
-
-            return response.choices[0].message.content
+            content = response.choices[0].message.content
+            llm_cache.set(key, content, prompt_type)
+            return content
                 
+        except NON_RETRYABLE_ERRORS as e:
+            print(f"Error in LLM call, not retrying: {str(e)}")
+            raise
         except Exception as e:
-            print(f"Error in together AI (attempt {attempt + 1}/{max_retries}): {str(e)}")
+            print(f"Error in LLM call (attempt {attempt + 1}/{max_retries}): {str(e)}")
             if attempt < max_retries - 1:
-                print(f"Retrying in 2 seconds...")
-                time.sleep(2)
+                delay = backoff_delay(attempt)
+                print(f"Retrying in {delay:.1f} seconds...")
+                time.sleep(delay)
             else:
                 print("Max retries reached, raising error")
                 raise e
     
-    raise Exception("Failed to get response from Ollama after max retries")
+    raise Exception("Failed to get response from LLM after max retries")
+
+async def chat_ollama_async(sys_prompt: str, user_prompt: str, model: str = "gemma3:4b-it-qat",
+                            max_retries: int = 3, timeout: Optional[float] = None,
+                            prompt_type: str = "default") -> str:
+    """
+    Async chat_ollama. `timeout` bounds each attempt in seconds; cancelling the
+    awaiting task aborts the in-flight HTTP request.
+    """
+    key = cache_key(LLM_MODEL, sys_prompt, user_prompt)
+    cached = llm_cache.get(key, prompt_type)
+    if cached is not None:
+        return cached
+
+    for attempt in range(max_retries):
+        try:
+            response = await asyncio.wait_for(
+                get_async_client().chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=[
+                        {"role": "system", "content": sys_prompt},
+                        {"role": "user", "content": user_prompt},
+                    ]
+                ),
+                timeout=timeout,
+            )
+
+            content = response.choices[0].message.content
+            llm_cache.set(key, content, prompt_type)
+            return content
+
+        except NON_RETRYABLE_ERRORS as e:
+            print(f"Error in LLM call, not retrying: {str(e)}")
+            raise
+        except Exception as e:
+            print(f"Error in LLM call (attempt {attempt + 1}/{max_retries}): {str(e) or type(e).__name__}")
+            if attempt < max_retries - 1:
+                delay = backoff_delay(attempt)
+                print(f"Retrying in {delay:.1f} seconds...")
+                await asyncio.sleep(delay)
+            else:
+                print("Max retries reached, raising error")
+                raise e
+
+    raise Exception("Failed to get response from LLM after max retries")
+
+async def chat_ollama_stream(sys_prompt: str, user_prompt: str, model: str = "gemma3:4b-it-qat",
+                             max_retries: int = 3, timeout: Optional[float] = None,
+                             prompt_type: str = "default") -> AsyncIterator[str]:
+    """
+    Stream the LLM answer as text deltas. Failures before the first token are retried like
+    chat_ollama_async; once tokens have been sent the error is raised to the caller.
+    `timeout` bounds the wait for each chunk in seconds. A cached response is sent as one
+    delta, and a completed stream is cached like chat_ollama_async.
+    """
+    key = cache_key(LLM_MODEL, sys_prompt, user_prompt)
+    cached = llm_cache.get(key, prompt_type)
+    if cached is not None:
+        yield cached
+        return
+
+    for attempt in range(max_retries):
+        parts = []
+        try:
+            stream = await asyncio.wait_for(
+                get_async_client().chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=[
+                        {"role": "system", "content": sys_prompt},
+                        {"role": "user", "content": user_prompt},
+                    ],
+                    stream=True,
+                ),
+                timeout=timeout,
+            )
+            chunks = stream.__aiter__()
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=timeout)
+                    except StopAsyncIteration:
+                        llm_cache.set(key, "".join(parts), prompt_type)
+                        return
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+            finally:
+                await stream.close()
+
+        except NON_RETRYABLE_ERRORS as e:
+            print(f"Error in LLM stream, not retrying: {str(e)}")
+            raise
+        except Exception as e:
+            print(f"Error in LLM stream (attempt {attempt + 1}/{max_retries}): {str(e) or type(e).__name__}")
+            if parts:
+                raise
+            if attempt < max_retries - 1:
+                delay = backoff_delay(attempt)
+                print(f"Retrying in {delay:.1f} seconds...")
+                await asyncio.sleep(delay)
+            else:
+                print("Max retries reached, raising error")
+                raise e
 
 def extract_json(text: str) -> Dict[str, Any]:
     """
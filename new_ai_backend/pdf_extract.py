@@ -0,0 +1,126 @@
+import math
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import BytesIO
+from typing import Callable, List, Optional, Tuple
+import pdfplumber
+
+# Kept free of the backend's heavier imports. Spawned pool workers import this module and also
+# re-run the launching script as __mp_main__ (a package's __main__, as in python -m uvicorn, is
+# the exception), so scripts that use the pool keep side effects under __main__ guards or in
+# startup hooks.
+
+# Processes used to extract PDF text; 1 disables the pool
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# PDFs with fewer pages are extracted in-process; it is also the smallest page range per task
+PDF_EXTRACT_MIN_PAGES = int(os.getenv("PDF_EXTRACT_MIN_PAGES", "16"))
+# Ranges per worker, so one slow range of dense pages does not leave the others idle
+RANGES_PER_WORKER = 4
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+def page_lines(page_text: str, page_str: str) -> List[Tuple[str, str]]:
+    """(line, page number) pairs for the non-blank lines of one page."""
+    return [(line.strip(), page_str) for line in page_text.splitlines() if line.strip()]
+
+def extract_page(page, page_num: int) -> List[Tuple[str, str]]:
+    """(line, page number) pairs for one pdfplumber page; a page that fails to parse is skipped,
+    so the serial and pooled paths return the same text for the same PDF."""
+    try:
+        return page_lines(page.extract_text() or "", str(page_num))
+    except Exception as e:
+        print(f"Error extracting text from page {page_num}: {e}")
+        return []
+
+def extract_pages(source, start: int, end: int) -> List[Tuple[str, str]]:
+    """(line, page number) pairs for pages [start, end) of a PDF path or file object."""
+    lines_with_pages = []
+    with pdfplumber.open(source) as pdf:
+        for page_num in range(start, end):
+            lines_with_pages.extend(extract_page(pdf.pages[page_num], page_num + 1))
+    return lines_with_pages
+
+def count_pages(pdf_bytes: bytes) -> int:
+    with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
+        return len(pdf.pages)
+
+def page_ranges(total_pages: int, workers: int, min_pages: int = PDF_EXTRACT_MIN_PAGES) -> List[Tuple[int, int]]:
+    """Split [0, total_pages) into contiguous ranges for the pool."""
+    size = max(min_pages, math.ceil(total_pages / (workers * RANGES_PER_WORKER)), 1)
+    return [(start, min(start + size, total_pages)) for start in range(0, total_pages, size)]
+
+def get_extract_pool(workers: int) -> ProcessPoolExecutor:
+    """Shared process pool, created on first use. Spawned rather than forked, since the
+    parent holds torch threads and database connections; see the note at the top of the
+    module on what a spawned worker imports."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+def reset_extract_pool():
+    """Drop a pool whose workers died so the next call starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+            _pool = None
+
+def extract_serial(pdf_bytes: bytes,
+                   progress_callback: Optional[Callable[[int, int], None]] = None) -> List[Tuple[str, str]]:
+    """Extract every page in this process, one after another."""
+    lines_with_pages = []
+    with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
+        total_pages = len(pdf.pages)
+        for page_num, page in enumerate(pdf.pages, 1):
+            lines_with_pages.extend(extract_page(page, page_num))
+            if progress_callback:
+                progress_callback(page_num, total_pages)
+    return lines_with_pages
+
+def extract_parallel(pdf_bytes: bytes, workers: int = PDF_EXTRACT_WORKERS,
+                     progress_callback: Optional[Callable[[int, int], None]] = None) -> List[Tuple[str, str]]:
+    """Extract (line, page number) pairs of page ranges on the process pool, merged back in page order.
+
+    progress_callback(pages_done, total_pages) is called as ranges finish.
+    """
+    total_pages = count_pages(pdf_bytes)
+    if workers <= 1 or total_pages < PDF_EXTRACT_MIN_PAGES:
+        return extract_serial(pdf_bytes, progress_callback)
+
+    # Workers read the PDF from a temporary file instead of receiving a copy per range
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        tmp.write(pdf_bytes)
+    try:
+        pool = get_extract_pool(workers)
+        ranges = page_ranges(total_pages, workers)
+        futures = {pool.submit(extract_pages, tmp.name, start, end): i for i, (start, end) in enumerate(ranges)}
+        results: List[Optional[List[Tuple[str, str]]]] = [None] * len(ranges)
+        pages_done = 0
+        try:
+            for future in as_completed(futures):
+                i = futures[future]
+                results[i] = future.result()
+                pages_done += ranges[i][1] - ranges[i][0]
+                if progress_callback:
+                    progress_callback(pages_done, total_pages)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    finally:
+        os.unlink(tmp.name)
+
+    lines_with_pages = []
+    for lines in results:
+        lines_with_pages.extend(lines)
+    return lines_with_pages
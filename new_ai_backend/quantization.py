@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+import uuid
+from typing import Tuple
+import numpy as np
+
+# "int8" keeps chunk vectors in RAM as int8 codes and the exact float32 vectors in
+# memory-mapped files used only for rescoring; "none" keeps float32 matrices in RAM
+INDEX_QUANTIZATION = os.getenv("INDEX_QUANTIZATION", "none")
+# Candidates rescored exactly per final hit (and per PDF when routing documents)
+RESCORE_FACTOR = int(os.getenv("INDEX_RESCORE_FACTOR", "4"))
+# How far below the similarity threshold an int8 score may be and still get rescored
+RESCORE_MARGIN = float(os.getenv("INDEX_RESCORE_MARGIN", "0.02"))
+# Directory for the memory-mapped float32 files; empty uses the system temp directory
+SPILL_DIR = os.getenv("INDEX_SPILL_DIR") or os.path.join(tempfile.gettempdir(), "vector_index")
+# Rows dequantized at a time while scoring, to bound the temporary float32 copy
+SCORE_BLOCK_SIZE = 65536
+
+def quantize_rows(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric int8 codes with one float32 scale per row."""
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+def dequantize_rows(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    return codes.astype(np.float32) * scales[:, None]
+
+def approximate_scores(codes: np.ndarray, scales: np.ndarray, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Dot products of the query with the dequantized rows, one block at a time."""
+    scores = np.empty(len(rows), dtype=np.float32)
+    for start in range(0, len(rows), SCORE_BLOCK_SIZE):
+        block = rows[start:start + SCORE_BLOCK_SIZE]
+        scores[start:start + len(block)] = (codes[block].astype(np.float32) @ query) * scales[block]
+    return scores
+
+class SpillStore:
+    """
+    Exact float32 matrices written to files under a per-process directory and mapped back
+    read-only, so they live in the page cache rather than the process heap.
+    """
+
+    def __init__(self, root: str = SPILL_DIR):
+        self.root = os.path.join(root, str(os.getpid()))
+        # Files left by an earlier process with the same pid are unreachable
+        shutil.rmtree(self.root, ignore_errors=True)
+        os.makedirs(self.root, exist_ok=True)
+
+    def write(self, matrix: np.ndarray) -> np.memmap:
+        path = os.path.join(self.root, f"{uuid.uuid4().hex}.f32")
+        np.ascontiguousarray(matrix, dtype=np.float32).tofile(path)
+        return np.memmap(path, dtype=np.float32, mode="r", shape=matrix.shape)
+
+    def release(self, matrix):
+        """Delete a spilled matrix's file; existing mappings stay valid until dropped."""
+        if isinstance(matrix, np.memmap) and matrix.filename:
+            try:
+                os.unlink(matrix.filename)
+            except FileNotFoundError:
+                pass
@@ -3,9 +3,10 @@ try:
 except ImportError:
     from serpapi.google_search_results import GoogleSearch
 import re
-from typing import List
+from typing import List, Optional
 import os
-from ollama_chat import chat_ollama
+import httpx
+from ollama_chat import chat_ollama, chat_ollama_async
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -18,11 +19,25 @@ SERPAPI_KEY = os.getenv('SERPAPI_KEY', '7b866668a4ef6ff88aa85124d24f84e4192ce3c0
 if not SERPAPI_KEY:
     raise ValueError("SERPAPI_KEY is not available")
 
-def get_search_query(search_query: str) -> str:
-    """
-    Generate a refined search query using OpenRouter.
-    """
-    system_prompt = """
+SERPAPI_URL = "https://serpapi.com/search.json"
+SEARCH_TIMEOUT = float(os.getenv("SEARCH_TIMEOUT", "20"))  # seconds per SerpAPI request
+
+_async_http: Optional[httpx.AsyncClient] = None
+
+def get_async_http() -> httpx.AsyncClient:
+    """Shared keep-alive HTTP client for async SerpAPI calls."""
+    global _async_http
+    if _async_http is None:
+        _async_http = httpx.AsyncClient(timeout=SEARCH_TIMEOUT)
+    return _async_http
+
+async def serpapi_search_async(params: dict, timeout: Optional[float] = None) -> dict:
+    """Async equivalent of GoogleSearch(params).get_dict()."""
+    params = dict(params, api_key=SERPAPI_KEY, output="json")
+    response = await get_async_http().get(SERPAPI_URL, params=params, timeout=timeout or SEARCH_TIMEOUT)
+    return response.json()
+
+IMAGE_SEARCH_QUERY_PROMPT = """
     Generate a specific and informative search query for finding relevant images. Follow these guidelines:
 
     1. Focus on technical and professional aspects:
@@ -63,24 +78,95 @@ def get_search_query(search_query: str) -> str:
     Return ONLY the search phrase without any additional text or explanations.
     """
 
+def fallback_search_query(search_query: str) -> str:
+    """Enhanced fallback query used when the LLM is unavailable."""
+    fallback_terms = [
+        "compliance",
+        "regulatory",
+        "technical",
+        "professional",
+        "infographic"
+    ]
+    return f"{search_query} {' '.join(fallback_terms[:2])}"
+
+def get_search_query(search_query: str) -> str:
+    """
+    Generate a refined search query using OpenRouter.
+    """
     try:
         response = chat_ollama(
-            system_prompt, 
+            IMAGE_SEARCH_QUERY_PROMPT, 
             f"Generate a specific image search query for: {search_query}", 
-            model="gemma3:4b-it-qat"
+            model="gemma3:4b-it-qat",
+            prompt_type="search_query"
+        )
+        return response.strip()
+    except Exception as e:
+        print(f"Error generating search query: {e}")
+        return fallback_search_query(search_query)
+
+async def get_search_query_async(search_query: str, timeout: Optional[float] = None) -> str:
+    """Async version of get_search_query."""
+    try:
+        response = await chat_ollama_async(
+            IMAGE_SEARCH_QUERY_PROMPT,
+            f"Generate a specific image search query for: {search_query}",
+            model="gemma3:4b-it-qat",
+            timeout=timeout,
+            prompt_type="search_query"
         )
         return response.strip()
     except Exception as e:
         print(f"Error generating search query: {e}")
-        # Enhanced fallback query
-        fallback_terms = [
-            "compliance",
-            "regulatory",
-            "technical",
-            "professional",
-            "infographic"
-        ]
-        return f"{search_query} {' '.join(fallback_terms[:2])}"
+        return fallback_search_query(search_query)
+
+def parse_image_results(results: dict, max_images: int) -> list:
+    """Extract image URLs from a google_images response."""
+    images = []
+    for img in results.get("images_results", [])[:max_images]:
+        if img.get("original"):
+            images.append(img["original"])
+    return images
+
+def parse_video_results(results: dict, max_videos: int) -> list:
+    """Extract YouTube video IDs from a youtube response."""
+    video_links = [vid.get("link") for vid in results.get("video_results", [])[:max_videos] if "link" in vid]
+
+    # Extract video IDs from URLs
+    return [re.search(r"v=([\w-]+)", link).group(1) for link in video_links if re.search(r"v=([\w-]+)", link)]
+
+def parse_web_links(results: dict, max_links: int) -> list:
+    """Extract result URLs from a google response."""
+    return [result.get("link") for result in results.get("organic_results", [])[:max_links] if "link" in result]
+
+def parse_serpapi_links(results: dict, num_results: int) -> list:
+    """Extract url/title/snippet dicts from a google response."""
+    links = []
+    for result in results.get("organic_results", [])[:num_results]:
+        if "link" in result:
+            links.append({
+                "url": result["link"],
+                "title": result.get("title", ""),
+                "snippet": result.get("snippet", "")
+            })
+    return links
+
+def image_search_params(search_query: str) -> dict:
+    # Use the search query directly without additional processing
+    return {
+        "engine": "google_images",
+        "q": search_query,
+        "api_key": SERPAPI_KEY,
+        "ijn": 0  # First page of results
+    }
+
+def serpapi_links_params(query: str, num_results: int) -> dict:
+    return {
+        "engine": "google",
+        "q": f"{query} compliance regulations guidelines",
+        "num": num_results,
+        "api_key": SERPAPI_KEY
+    }
 
 def search_images(search_query: str, max_images: int = 5) -> list:
     """
@@ -88,32 +174,33 @@ def search_images(search_query: str, max_images: int = 5) -> list:
     Returns a list of image URLs.
     """
     try:
-        # Use the search query directly without additional processing
-        params = {
-            "engine": "google_images",
-            "q": search_query,
-            "api_key": SERPAPI_KEY,
-            "ijn": 0  # First page of results
-        }
-
-        search = GoogleSearch(params)
+        search = GoogleSearch(image_search_params(search_query))
         results = search.get_dict()
 
         if "error" in results:
             print(f"SerpAPI error: {results['error']}")
             return []
 
-        # Extract image URLs from results
-        images = []
-        for img in results.get("images_results", [])[:max_images]:
-            if img.get("original"):
-                images.append(img["original"])
-                
-        return images
+        return parse_image_results(results, max_images)
 
     except Exception as e:
         print(f"Error searching for images: {str(e)}")
         return []
+
+async def search_images_async(search_query: str, max_images: int = 5, timeout: Optional[float] = None) -> list:
+    """Async version of search_images."""
+    try:
+        results = await serpapi_search_async(image_search_params(search_query), timeout)
+
+        if "error" in results:
+            print(f"SerpAPI error: {results['error']}")
+            return []
+
+        return parse_image_results(results, max_images)
+
+    except Exception as e:
+        print(f"Error searching for images: {str(e) or type(e).__name__}")
+        return []
     
 def search_videos(search_query: str, max_videos: int = 5) -> list:
     """
@@ -136,15 +223,33 @@ def search_videos(search_query: str, max_videos: int = 5) -> list:
             print(f"SerpAPI error: {results['error']}")
             return []
 
-        video_links = [vid.get("link") for vid in results.get("video_results", [])[:max_videos] if "link" in vid]
+        return parse_video_results(results, max_videos)
 
-        # Extract video IDs from URLs
-        video_ids = [re.search(r"v=([\w-]+)", link).group(1) for link in video_links if re.search(r"v=([\w-]+)", link)]
+    except Exception as e:
+        print(f"Error in search_videos function for query '{search_query}': {str(e)}")
+        return []
 
-        return video_ids
+async def search_videos_async(search_query: str, max_videos: int = 5, timeout: Optional[float] = None) -> list:
+    """Async version of search_videos; the timeout applies to each of its two calls."""
+    try:
+        query = await get_search_query_async(search_query, timeout)
+
+        params = {
+            "engine": "youtube",
+            "search_query": query,
+            "api_key": SERPAPI_KEY
+        }
+
+        results = await serpapi_search_async(params, timeout)
+
+        if "error" in results:
+            print(f"SerpAPI error: {results['error']}")
+            return []
+
+        return parse_video_results(results, max_videos)
 
     except Exception as e:
-        print(f"Error in search_videos function for query '{search_query}': {str(e)}")
+        print(f"Error in search_videos_async function for query '{search_query}': {str(e) or type(e).__name__}")
         return []
 
 def search_web_links(search_query: str, max_links: int = 5) -> list:
@@ -167,25 +272,37 @@ def search_web_links(search_query: str, max_links: int = 5) -> list:
             return []
 
         # Extract links from search results
-        web_links = [result.get("link") for result in results.get("organic_results", [])[:max_links] if "link" in result]
-
-        return web_links
+        return parse_web_links(results, max_links)
 
     except Exception as e:
         print(f"Error in search_web_links function for query '{search_query}': {str(e)}")
         return []
 
-def get_serpapi_links(query: str, num_results: int = 5) -> list:
-    """Get relevant links using SerpAPI."""
+async def search_web_links_async(search_query: str, max_links: int = 5, timeout: Optional[float] = None) -> list:
+    """Async version of search_web_links."""
     try:
         params = {
             "engine": "google",
-            "q": f"{query} compliance regulations guidelines",
-            "num": num_results,
+            "q": search_query,
             "api_key": SERPAPI_KEY
         }
-        
-        search = GoogleSearch(params)
+
+        results = await serpapi_search_async(params, timeout)
+
+        if "error" in results:
+            print(f"SerpAPI error: {results['error']}")
+            return []
+
+        return parse_web_links(results, max_links)
+
+    except Exception as e:
+        print(f"Error in search_web_links_async function for query '{search_query}': {str(e) or type(e).__name__}")
+        return []
+
+def get_serpapi_links(query: str, num_results: int = 5) -> list:
+    """Get relevant links using SerpAPI."""
+    try:
+        search = GoogleSearch(serpapi_links_params(query, num_results))
         results = search.get_dict()
         
         if "error" in results:
@@ -193,16 +310,21 @@ def get_serpapi_links(query: str, num_results: int = 5) -> list:
             return []
             
         # Extract organic search results
-        links = []
-        for result in results.get("organic_results", [])[:num_results]:
-            if "link" in result:
-                links.append({
-                    "url": result["link"],
-                    "title": result.get("title", ""),
-                    "snippet": result.get("snippet", "")
-                })
-        
-        return links
+        return parse_serpapi_links(results, num_results)
     except Exception as e:
         print(f"Error in SerpAPI search: {e}")
-        return []
\ No newline at end of file
+        return []
+
+async def get_serpapi_links_async(query: str, num_results: int = 5, timeout: Optional[float] = None) -> list:
+    """Async version of get_serpapi_links."""
+    try:
+        results = await serpapi_search_async(serpapi_links_params(query, num_results), timeout)
+        
+        if "error" in results:
+            print(f"SerpAPI error: {results['error']}")
+            return []
+            
+        return parse_serpapi_links(results, num_results)
+    except Exception as e:
+        print(f"Error in SerpAPI search: {e or type(e).__name__}")
+        return []
@@ -0,0 +1,157 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import redis
+from embedding_store import blob_to_vector, vector_to_blob
+from llm_cache import REDIS_HOST, REDIS_PORT
+from similarity import normalize_vector
+
+# Minimum cosine similarity between query embeddings for a cached response to be reused
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+# Most recent answered queries kept per settings/PDF scope
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "500"))
+SEMANTIC_CACHE_EXPIRY = int(os.getenv("SEMANTIC_CACHE_EXPIRY", "3600"))  # seconds
+# Scopes mirrored in memory; older ones are usually from a previous corpus version
+LOCAL_SCOPES = 64
+
+KEY_PREFIX = "semantic_cache"
+CORPUS_VERSION_KEY = f"{KEY_PREFIX}:corpus_version"
+
+class SemanticCache:
+    """
+    Reuses /api/query responses for differently worded queries with near-identical embeddings.
+    Entries live in Redis, scoped by query settings, chosen PDFs and the corpus version, so any
+    PDF upload, delete or info change makes earlier answers unreachable.
+    """
+
+    def __init__(self, redis_client: redis.Redis, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES, expiry: int = SEMANTIC_CACHE_EXPIRY):
+        self.redis = redis_client
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.expiry = expiry
+        self._lock = threading.Lock()
+        # scope -> (write counter, normalized query matrix, entries) mirrored from Redis
+        self._local: Dict[str, Tuple[int, np.ndarray, List[dict]]] = {}
+        self._stats = {
+            "lookups": 0,
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "errors": 0,
+            "llm_calls_saved": 0,
+            "total_hit_similarity": 0.0
+        }
+
+    def _count(self, field: str, amount=1):
+        with self._lock:
+            self._stats[field] += amount
+
+    def corpus_version(self) -> int:
+        return int(self.redis.get(CORPUS_VERSION_KEY) or 0)
+
+    def bump_corpus_version(self) -> bool:
+        """Invalidate every cached answer and tell running servers to reload changed PDFs into
+        their vector index; call after the PDF corpus changes. False if Redis was unreachable."""
+        try:
+            self.redis.incr(CORPUS_VERSION_KEY)
+            return True
+        except Exception as e:
+            print(f"Error invalidating semantic cache: {e}")
+            self._count("errors")
+            return False
+
+    def _scope(self, settings: Dict[str, bool], chosen_pdfs: List[str]) -> str:
+        scope = json.dumps({
+            "settings": settings,
+            "chosen_pdfs": sorted(chosen_pdfs),
+            "corpus_version": self.corpus_version()
+        }, sort_keys=True)
+        return f"{KEY_PREFIX}:{hashlib.sha256(scope.encode()).hexdigest()}"
+
+    def _entries(self, scope: str) -> Tuple[np.ndarray, List[dict]]:
+        """Query matrix and entries for a scope, re-read from Redis only when it has new writes."""
+        writes = int(self.redis.get(f"{scope}:writes") or 0)
+        with self._lock:
+            local = self._local.get(scope)
+        if local is not None and local[0] == writes:
+            return local[1], local[2]
+
+        entries = [json.loads(raw) for raw in self.redis.lrange(f"{scope}:entries", 0, -1)]
+        if entries:
+            matrix = np.stack([blob_to_vector(base64.b64decode(entry["vector"])) for entry in entries])
+        else:
+            matrix = np.empty((0, 0), dtype=np.float32)
+        with self._lock:
+            self._local.pop(scope, None)
+            while len(self._local) >= LOCAL_SCOPES:
+                self._local.pop(next(iter(self._local)))
+            self._local[scope] = (writes, matrix, entries)
+        return matrix, entries
+
+    def lookup(self, query_vector, settings: Dict[str, bool], chosen_pdfs: List[str]) -> Optional[Dict]:
+        """Cached response for the most similar earlier query in the same scope, if close enough."""
+        self._count("lookups")
+        try:
+            matrix, entries = self._entries(self._scope(settings, chosen_pdfs))
+        except Exception as e:
+            print(f"Error reading semantic cache: {e}")
+            self._count("errors")
+            return None
+
+        if entries:
+            scores = matrix @ normalize_vector(query_vector)
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            if similarity >= self.threshold:
+                entry = entries[best]
+                print(f"Semantic cache hit ({similarity:.3f}) for earlier query: {entry['query']}")
+                with self._lock:
+                    self._stats["hits"] += 1
+                    self._stats["llm_calls_saved"] += entry["llm_calls"]
+                    self._stats["total_hit_similarity"] += similarity
+                return entry["response"]
+
+        self._count("misses")
+        return None
+
+    def store(self, query: str, query_vector, response: Dict, settings: Dict[str, bool],
+              chosen_pdfs: List[str], llm_calls: int):
+        """Remember a response together with the embedding of the query that produced it."""
+        entry = {
+            "query": query,
+            "vector": base64.b64encode(vector_to_blob(normalize_vector(query_vector))).decode("ascii"),
+            "response": response,
+            "llm_calls": llm_calls
+        }
+        try:
+            scope = self._scope(settings, chosen_pdfs)
+            pipe = self.redis.pipeline()
+            pipe.rpush(f"{scope}:entries", json.dumps(entry))
+            pipe.ltrim(f"{scope}:entries", -self.max_entries, -1)
+            pipe.expire(f"{scope}:entries", self.expiry)
+            pipe.incr(f"{scope}:writes")
+            pipe.expire(f"{scope}:writes", self.expiry)
+            pipe.execute()
+            self._count("stores")
+        except Exception as e:
+            print(f"Error writing semantic cache: {e}")
+            self._count("errors")
+
+    def stats(self) -> Dict:
+        """Hit rate, LLM calls avoided and the similarity of served hits."""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["lookups"]
+        hits = stats["hits"]
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        stats["avg_hit_similarity"] = stats.pop("total_hit_similarity") / hits if hits else 0.0
+        stats["threshold"] = self.threshold
+        return stats
+
+# Process-wide cache shared by /api/query and the PDF management paths
+semantic_cache = SemanticCache(redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True))
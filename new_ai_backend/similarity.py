@@ -0,0 +1,43 @@
+from typing import Optional
+import numpy as np
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale each row to unit length so dot products are cosine similarities."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def normalize_vector(vector) -> np.ndarray:
+    """Unit-length float32 copy of a single query vector."""
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores, best first, using a partial sort."""
+    if k <= 0 or len(scores) == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(scores, -k)[-k:]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(scores[candidates])[::-1]]
+
+def select_top_chunks(scores: np.ndarray, doc_ids: np.ndarray, k: int, threshold: float = 0.0,
+                      per_document: Optional[int] = None) -> np.ndarray:
+    """Positions of the best k scores above threshold, with at most per_document hits per document."""
+    candidates = np.nonzero(scores >= threshold)[0]
+    if len(candidates) == 0:
+        return candidates
+
+    # A per-document cap at or above k can never bind
+    if per_document is not None and per_document < k:
+        # Group by document, best score first within each group, then rank inside the group
+        order = candidates[np.lexsort((-scores[candidates], doc_ids[candidates]))]
+        grouped = doc_ids[order]
+        group_start = np.concatenate([[True], grouped[1:] != grouped[:-1]])
+        start_positions = np.maximum.accumulate(np.where(group_start, np.arange(len(order)), 0))
+        rank = np.arange(len(order)) - start_positions
+        candidates = order[rank < per_document]
+
+    return candidates[top_k_indices(scores[candidates], k)]
@@ -0,0 +1,188 @@
+import asyncio
+import json
+import os
+import uuid
+from typing import Awaitable, Callable, Dict, Optional
+import redis.asyncio as aioredis
+from llm_cache import REDIS_HOST, REDIS_PORT
+
+# How long a worker may hold the computation lock before another may take over (seconds).
+# Must exceed the slowest pipeline it protects, or a second worker starts the same work.
+SINGLE_FLIGHT_LOCK_TTL = float(os.getenv("SINGLE_FLIGHT_LOCK_TTL", "180"))
+# How long a caller waits for another worker's result before computing it itself (seconds)
+SINGLE_FLIGHT_WAIT_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_WAIT_TIMEOUT", "200"))
+# How often a waiting caller checks that the lock holder is still alive (seconds)
+LOCK_POLL_INTERVAL = 1.0
+
+KEY_PREFIX = "single_flight"
+
+# Delete the lock only if this worker still owns it
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+class SingleFlightError(Exception):
+    """The computation this caller was waiting on failed in another worker."""
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key so only one computation runs. Callers in this
+    process share an asyncio task; other workers wait on a Redis lock and receive the result
+    over pub/sub. Results must be JSON-serializable.
+    """
+
+    def __init__(self, lock_ttl: float = SINGLE_FLIGHT_LOCK_TTL, wait_timeout: float = SINGLE_FLIGHT_WAIT_TIMEOUT):
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self._redis: Optional[aioredis.Redis] = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._stats = {
+            "calls": 0,
+            "computed": 0,
+            "local_waits": 0,
+            "remote_waits": 0,
+            "remote_results": 0,
+            "takeovers": 0,
+            "lock_errors": 0
+        }
+
+    def _get_redis(self) -> aioredis.Redis:
+        # Created lazily so it binds to the server's event loop
+        if self._redis is None:
+            self._redis = aioredis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0, decode_responses=True)
+        return self._redis
+
+    async def do(self, key: str, compute: Callable[[], Awaitable],
+                 load_cached: Optional[Callable[[], Awaitable]] = None):
+        """
+        Return compute() for key, running it at most once across concurrent callers and workers.
+        `load_cached` reads the cache compute() fills, so late waiters can pick the result up there.
+        """
+        self._stats["calls"] += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._run(key, compute, load_cached))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self._stats["local_waits"] += 1
+        # A cancelled caller must not cancel the computation others are waiting on
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark as retrieved when every caller has gone away
+
+    async def _run(self, key: str, compute: Callable[[], Awaitable],
+                   load_cached: Optional[Callable[[], Awaitable]]):
+        redis_client = self._get_redis()
+        lock_key = f"{KEY_PREFIX}:lock:{key}"
+        channel = f"{KEY_PREFIX}:done:{key}"
+        token = uuid.uuid4().hex
+        deadline = asyncio.get_running_loop().time() + self.wait_timeout
+
+        while True:
+            try:
+                acquired = await redis_client.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000))
+            except Exception as e:
+                print(f"Single-flight lock unavailable, computing locally: {e}")
+                self._stats["lock_errors"] += 1
+                return await self._compute(compute)
+
+            if acquired:
+                try:
+                    result = await self._compute(compute)
+                except Exception as e:
+                    await self._publish(channel, {"error": str(e) or type(e).__name__})
+                    raise
+                else:
+                    await self._publish(channel, {"result": result})
+                    return result
+                finally:
+                    await self._release(lock_key, token)
+
+            # Another worker holds the lock: wait for it to hand the result over
+            self._stats["remote_waits"] += 1
+            message = await self._wait_for_result(lock_key, channel, load_cached, deadline)
+            if message is not None:
+                if "error" in message:
+                    raise SingleFlightError(message["error"])
+                self._stats["remote_results"] += 1
+                return message["result"]
+
+            # The holder vanished without publishing, or took too long
+            if load_cached is not None:
+                cached = await load_cached()
+                if cached:
+                    self._stats["remote_results"] += 1
+                    return cached
+            if asyncio.get_running_loop().time() >= deadline:
+                print(f"Timed out waiting for {key}, computing locally")
+                self._stats["takeovers"] += 1
+                return await self._compute(compute)
+
+    async def _compute(self, compute: Callable[[], Awaitable]):
+        self._stats["computed"] += 1
+        return await compute()
+
+    async def _wait_for_result(self, lock_key: str, channel: str,
+                               load_cached: Optional[Callable[[], Awaitable]], deadline: float) -> Optional[dict]:
+        """Message published by the lock holder, or None if it released the lock or the deadline passed."""
+        redis_client = self._get_redis()
+        loop = asyncio.get_running_loop()
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.subscribe(channel)
+            # The holder may have finished between our lock attempt and subscribing
+            if load_cached is not None:
+                cached = await load_cached()
+                if cached:
+                    return {"result": cached}
+            while loop.time() < deadline:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=LOCK_POLL_INTERVAL)
+                if message is not None:
+                    return json.loads(message["data"])
+                if not await redis_client.exists(lock_key):
+                    # The result is published before the lock is released, so it may already be queued
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=LOCK_POLL_INTERVAL)
+                    return json.loads(message["data"]) if message is not None else None
+            return None
+        except Exception as e:
+            print(f"Error waiting for single-flight result: {e}")
+            self._stats["lock_errors"] += 1
+            return None
+        finally:
+            try:
+                await pubsub.unsubscribe(channel)
+                await pubsub.reset()
+            except Exception:
+                pass
+
+    async def _publish(self, channel: str, payload: dict):
+        try:
+            await self._get_redis().publish(channel, json.dumps(payload))
+        except Exception as e:
+            print(f"Error publishing single-flight result: {e}")
+            self._stats["lock_errors"] += 1
+
+    async def _release(self, lock_key: str, token: str):
+        try:
+            await self._get_redis().eval(_RELEASE_SCRIPT, 1, lock_key, token)
+        except Exception as e:
+            print(f"Error releasing single-flight lock: {e}")
+            self._stats["lock_errors"] += 1
+
+    def stats(self) -> Dict:
+        """Counters showing how many calls were served without recomputing."""
+        stats = dict(self._stats)
+        stats["in_flight"] = len(self._inflight)
+        stats["coalesced"] = stats["calls"] - stats["computed"]
+        return stats
+
+# Process-wide instance used by the cached query paths in main.py
+single_flight = SingleFlight()
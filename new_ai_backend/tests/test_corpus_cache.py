@@ -0,0 +1,50 @@
+import asyncio
+import main
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+def test_pdf_caches_miss_after_corpus_version_bump(monkeypatch):
+    version = [1]
+    calls = {"identify": 0, "search": 0}
+
+    def identify(query):
+        calls["identify"] += 1
+        return ["manual"]
+
+    def search(query_vector, pdf_names, threshold):
+        calls["search"] += 1
+        return [{"pdf_name": "manual", "page_number": "1", "text": f"version {version[0]}"}]
+
+    async def run_cpu(func, *args, **kwargs):
+        return func(*args, **kwargs)
+
+    async def single_flight(key, compute, load_cached=None):
+        return await compute()
+
+    monkeypatch.setattr(main, "redis_client", FakeRedis())
+    monkeypatch.setattr(main.semantic_cache, "corpus_version", lambda: version[0])
+    monkeypatch.setattr(main, "identify_relevant_pdfs", identify)
+    monkeypatch.setattr(main, "search_relevant_texts", search)
+    monkeypatch.setattr(main, "run_cpu", run_cpu)
+    monkeypatch.setattr(main.single_flight, "do", single_flight)
+
+    async def ask():
+        pdfs = await main.identify_relevant_pdfs_cached("flange size")
+        return await main.process_pdfs_cached("flange size", [0.1, 0.2], pdfs)
+
+    context, _ = asyncio.run(ask())
+    assert asyncio.run(ask())[0] == context
+    assert calls == {"identify": 1, "search": 1}
+
+    version[0] = 2
+    context, _ = asyncio.run(ask())
+    assert calls == {"identify": 2, "search": 2}
+    assert "version 2" in context
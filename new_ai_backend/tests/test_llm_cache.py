@@ -0,0 +1,63 @@
+import llm_cache
+from llm_cache import LLMCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def get(self, key):
+        self.calls.append(lambda: self.redis.values.get(key))
+
+    def ttl(self, key):
+        self.calls.append(lambda: self.redis.ttls.get(key, -2))
+
+    def execute(self):
+        return [call() for call in self.calls]
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.ttls = {}
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+        self.ttls[key] = ex
+
+def test_memory_tier_expires_with_prompt_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_cache, "time", clock)
+    cache = LLMCache(max_entries=10)
+
+    cache.set("k", "answer", prompt_type="final_answer")
+    clock.now += llm_cache.prompt_ttl("final_answer") - 1
+    assert cache.get("k", "final_answer") == "answer"
+    clock.now += 2
+    assert cache.get("k", "final_answer") is None
+    assert cache.stats()["memory_entries"] == 0
+
+def test_redis_hit_keeps_remaining_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_cache, "time", clock)
+    redis = FakeRedis()
+    redis.values["k"] = "answer"
+    redis.ttls["k"] = 10
+    cache = LLMCache(max_entries=10, redis_client=redis)
+
+    assert cache.get("k", "chat_name") == "answer"
+    # Gone from Redis, so only the promoted copy can answer
+    redis.values.clear()
+    clock.now += 9
+    assert cache.get("k", "chat_name") == "answer"
+    clock.now += 2
+    assert cache.get("k", "chat_name") is None
@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor
+import pdfplumber
+import pdf_extract
+
+def make_pdf(pages: int) -> bytes:
+    """Minimal PDF with one line of text, "Page text N", per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for n in range(1, pages + 1):
+        stream = f"BT /F1 12 Tf 72 720 Td (Page text {n}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for i, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+def test_serial_and_pooled_extraction_skip_the_same_failing_page(monkeypatch):
+    extract_text = pdfplumber.page.Page.extract_text
+
+    def failing_extract_text(page, *args, **kwargs):
+        if page.page_number == 3:
+            raise ValueError("broken content stream")
+        return extract_text(page, *args, **kwargs)
+
+    # Threads instead of spawned processes, so the patched page reaches the pooled path
+    pool = ThreadPoolExecutor(2)
+    monkeypatch.setattr(pdfplumber.page.Page, "extract_text", failing_extract_text)
+    monkeypatch.setattr(pdf_extract, "get_extract_pool", lambda workers: pool)
+
+    pdf_bytes = make_pdf(40)
+    serial = pdf_extract.extract_serial(pdf_bytes)
+    pooled = pdf_extract.extract_parallel(pdf_bytes, workers=2)
+    pool.shutdown()
+
+    assert len(pdf_extract.page_ranges(40, 2)) > 1
+    assert pooled == serial
+    assert [page for _, page in serial] == [str(n) for n in range(1, 41) if n != 3]
@@ -1,26 +1,61 @@
+import hashlib
 import json
+import os
 import re
-from io import BytesIO
-from typing import Dict, List, Optional
+import time
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 import psycopg2
-import pdfplumber
-from sentence_transformers import SentenceTransformer
-
-# Database Configuration
-DB_CONFIG = {
-    "dbname": "gcn-legacy",
-    "user": "postgres",
-    "password": "12345",
-    "host": "172.19.171.58",
-    "port": "5432"
-}
+from psycopg2.extras import execute_values
+import embedding_cache
+import model_registry
+import vector_index
+from blob_store import blob_store
+from boilerplate import drop_near_duplicates, strip_boilerplate
+from db import get_db_connection
+from pdf_extract import (
+    PDF_EXTRACT_WORKERS,
+    extract_parallel,
+    extract_serial,
+    reset_extract_pool,
+)
+from semantic_cache import semantic_cache
+from utils import count_tokens
+from embedding_store import (
+    blob_to_vector,
+    decode_document,
+    format_page_range,
+    parse_page_range,
+    vector_to_blob,
+    vectors_to_matrix,
+)
+
+# Number of chunks encoded per forward pass during ingestion
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
 
-# Initialize text model
-text_model = SentenceTransformer('all-MiniLM-L6-v2')
+# How documents are split before embedding: "sentences" packs whole sentences (split at
+# clauses only when one is too long) into chunks of at most CHUNK_MAX_TOKENS tokens, repeating
+# up to CHUNK_OVERLAP_TOKENS of trailing sentences in the next chunk; "words" is the original
+# 20-word window with a 5-word overlap. The default model reads at most 256 word pieces.
+CHUNKER = os.getenv("CHUNKER", "sentences")
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "96"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "24"))
+
+# Words ending in a period that rarely end a sentence
+ABBREVIATIONS = {
+    "e.g.", "i.e.", "cf.", "vs.", "al.", "fig.", "figs.", "eq.", "eqs.", "no.", "nos.", "vol.",
+    "p.", "pp.", "ch.", "sec.", "ref.", "refs.", "approx.", "dr.", "mr.", "mrs.", "ms.", "prof.", "st."
+}
+SENTENCE_END = re.compile(r"[.!?][\"'\u2019\u201d)\]]*$")
+CLAUSE_END = re.compile(r"[,;:][\"'\u2019\u201d)\]]*$")
 
-def get_db_connection():
-    """Create and return a database connection."""
-    return psycopg2.connect(**DB_CONFIG)
+# Document search: results returned, reciprocal rank fusion constant, the embedding
+# similarity a PDF needs to be returned for meaning alone, and the query length (characters)
+# below which search-as-you-type skips the embedding model
+SEARCH_RESULT_LIMIT = int(os.getenv("SEARCH_RESULT_LIMIT", "20"))
+SEARCH_RRF_K = int(os.getenv("SEARCH_RRF_K", "60"))
+SEARCH_MIN_SIMILARITY = float(os.getenv("SEARCH_MIN_SIMILARITY", "0.35"))
+SEARCH_MIN_SEMANTIC_LENGTH = int(os.getenv("SEARCH_MIN_SEMANTIC_LENGTH", "4"))
 
 def create_tables():
     """Create database tables if they don't exist"""
@@ -38,6 +73,88 @@ def create_tables():
             )
         """)
         
+        # Legacy per-document vector columns, emptied by migrate_to_chunk_table
+        cur.execute("""
+            ALTER TABLE pdfdata
+                ADD COLUMN IF NOT EXISTS embeddings BYTEA,
+                ADD COLUMN IF NOT EXISTS embedding_dim INTEGER
+        """)
+        
+        # Model the stored vectors were produced with, checked when the index loads
+        cur.execute("""
+            ALTER TABLE pdfdata ADD COLUMN IF NOT EXISTS embedding_model TEXT
+        """)
+        
+        # SHA-256 of the uploaded file, so re-uploading an identical PDF is a no-op
+        cur.execute("""
+            ALTER TABLE pdfdata ADD COLUMN IF NOT EXISTS file_hash TEXT
+        """)
+        
+        # Set when the original file lives in the blob store instead of pdf_file
+        cur.execute("""
+            ALTER TABLE pdfdata ADD COLUMN IF NOT EXISTS blob_hash TEXT
+        """)
+        
+        # k-means representatives of the chunk vectors (float32 rows) for document routing
+        cur.execute("""
+            ALTER TABLE pdfdata ADD COLUMN IF NOT EXISTS summary_vectors BYTEA
+        """)
+        
+        # What ingestion removed (boilerplate lines, near-duplicate chunks) and embedded
+        cur.execute("""
+            ALTER TABLE pdfdata ADD COLUMN IF NOT EXISTS ingest_stats JSONB
+        """)
+        
+        # One row per chunk with its float32 embedding
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS pdf_chunks (
+                pdf_name TEXT NOT NULL REFERENCES pdfdata(pdf_name)
+                    ON DELETE CASCADE ON UPDATE CASCADE,
+                chunk_id INTEGER NOT NULL,
+                page_start INTEGER NOT NULL,
+                page_end INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                embedding BYTEA NOT NULL,
+                PRIMARY KEY (pdf_name, chunk_id)
+            )
+        """)
+        
+        # Full-text index over chunk text. 'english' stems prose, while codes such as
+        # "ISO 13849-1" stay number tokens that a phrase query matches exactly.
+        cur.execute("""
+            ALTER TABLE pdf_chunks ADD COLUMN IF NOT EXISTS text_tsv tsvector
+                GENERATED ALWAYS AS (to_tsvector('english', text)) STORED
+        """)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS pdf_chunks_text_tsv_idx ON pdf_chunks USING GIN (text_tsv)
+        """)
+        
+        # Trigram indexes serve the name/info substring match without scanning pdfdata
+        cur.execute("SAVEPOINT trigram")
+        try:
+            cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS pdfdata_name_trgm_idx ON pdfdata USING GIN (pdf_name gin_trgm_ops)
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS pdfdata_info_trgm_idx ON pdfdata USING GIN (pdf_info gin_trgm_ops)
+            """)
+            cur.execute("RELEASE SAVEPOINT trigram")
+        except Exception as e:
+            print(f"pg_trgm unavailable, PDF name search will scan pdfdata: {e}")
+            cur.execute("ROLLBACK TO SAVEPOINT trigram")
+        
+        # SHA-256 of each page's extracted text, to report which pages a re-upload changed
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS pdf_pages (
+                pdf_name TEXT NOT NULL REFERENCES pdfdata(pdf_name)
+                    ON DELETE CASCADE ON UPDATE CASCADE,
+                page_number INTEGER NOT NULL,
+                text_hash TEXT NOT NULL,
+                PRIMARY KEY (pdf_name, page_number)
+            )
+        """)
+        
         conn.commit()
     except Exception as e:
         print(f"Error creating tables: {e}")
@@ -46,20 +163,26 @@ def create_tables():
         cur.close()
         conn.close()
 
-def extract_pdf_text(pdf_bytes: bytes) -> str:
-    """Extracts text from PDF with page numbers for each word."""
-    text_with_pages = []
-    try:
-        with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
-            for page_num, page in enumerate(pdf.pages, 1):
-                page_text = page.extract_text() or ""
-                # Add page number for each word to track cross-page chunks
-                words = page_text.split()
-                for word in words:
-                    text_with_pages.append((word, str(page_num)))
+def extract_pdf_text(pdf_bytes: bytes, progress_callback: Optional[Callable[[int, int], None]] = None,
+                     workers: int = PDF_EXTRACT_WORKERS, stats: Optional[Dict] = None) -> List[tuple]:
+    """Extracts text from PDF with page numbers for each word.
+    
+    Page ranges are extracted on a process pool of `workers` processes and merged in
+    page order. progress_callback(pages_done, total_pages) reports extraction progress.
+    Running headers, footers and blank-page notices are left out (see strip_boilerplate),
+    and a stats dict, if given, receives how much was removed.
+    """
+    try:
+        try:
+            lines_with_pages = extract_parallel(pdf_bytes, workers, progress_callback)
+        except BrokenProcessPool as e:
+            print(f"PDF extraction pool failed, extracting serially: {e}")
+            reset_extract_pool()
+            lines_with_pages = extract_serial(pdf_bytes, progress_callback)
+        return strip_boilerplate(lines_with_pages, stats)
     except Exception as e:
         print(f"Error extracting text: {e}")
-    return text_with_pages
+    return []
 
 def extract_pdf_info(text_with_pages: List[tuple]) -> str:
     """Extract first 300 words as PDF info from the word-page tuple list."""
@@ -70,64 +193,295 @@ def extract_pdf_info(text_with_pages: List[tuple]) -> str:
     words = [word for word, _ in text_with_pages[:300]]
     return ' '.join(words)
 
-def text_to_vector(text_with_pages: List[tuple]) -> List[Dict]:
-    """Converts text to vectors using overlapping chunks of max 20 words."""
-    vectors = []
-    chunk_size = 20
-    overlap = 5  # Number of words to overlap between chunks
+def hash_file(pdf_bytes: bytes) -> str:
+    """SHA-256 of the uploaded file."""
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+def hash_pages(text_with_pages: List[tuple]) -> Dict[int, str]:
+    """SHA-256 of each page's extracted words, keyed by page number."""
+    pages: Dict[int, List[str]] = {}
+    for word, page_str in text_with_pages:
+        pages.setdefault(int(page_str), []).append(word)
+    return {page: hashlib.sha256(' '.join(words).encode()).hexdigest() for page, words in pages.items()}
+
+def changed_pages(old_hashes: Dict[int, str], new_hashes: Dict[int, str]) -> List[int]:
+    """Pages added, removed or edited between two hash_pages results."""
+    return sorted(page for page in old_hashes.keys() | new_hashes.keys()
+                  if old_hashes.get(page) != new_hashes.get(page))
+
+def page_spans(text_with_pages: List[tuple]) -> Iterator[Tuple[int, int]]:
+    """(start, end) word indexes of each page's run of words."""
+    total = len(text_with_pages)
+    page_start = 0
+    while page_start < total:
+        page_end = page_start
+        while page_end < total and text_with_pages[page_end][1] == text_with_pages[page_start][1]:
+            page_end += 1
+        yield page_start, page_end
+        page_start = page_end
+
+def page_range(chunk: List[tuple]) -> str:
+    """Page string ("3" or "3-5") covering a slice of word-page tuples."""
+    unique_pages = sorted({int(page) for _, page in chunk})
+    return format_page_range(unique_pages[0], unique_pages[-1])
+
+def chunk_text(text_with_pages: List[tuple], chunk_size: int = 20, overlap: int = 5) -> Iterator[Tuple[str, str]]:
+    """Yield (text, page range) for overlapping chunks of max chunk_size words.
     
-    if not text_with_pages:
-        return vectors
+    Windows restart at the first word of every page and run at most `overlap` words into
+    the next one, so editing a page only changes the chunks of that page and the last
+    chunk before it. Unchanged pages keep their chunk texts and can reuse their vectors.
+    """
+    step = chunk_size - overlap
+    for page_start, page_end in page_spans(text_with_pages):
+        i = page_start
+        while True:
+            chunk = text_with_pages[i:min(i + chunk_size, page_end + overlap)]
+            text_chunk = ' '.join(word for word, _ in chunk)
+            if text_chunk.strip():
+                yield text_chunk, page_range(chunk)
+            if i + chunk_size >= page_end:
+                break
+            i += step
+
+def ends_sentence(words: List[str], i: int) -> bool:
+    """Whether words[i] ends a sentence: terminal punctuation not on an abbreviation or
+    initial, and a next word that does not continue in lower case."""
+    word = words[i]
+    if not SENTENCE_END.search(word) or word.lower() in ABBREVIATIONS or re.fullmatch(r"[A-Za-z]\.", word):
+        return False
+    following = words[i + 1].lstrip("\"'\u2018\u201c([") if i + 1 < len(words) else ""
+    return not following[:1].islower()
+
+def split_span(words: List[str], start: int, end: int, max_tokens: int,
+               clauses: bool = True) -> List[Tuple[int, int, int]]:
+    """(start, end, tokens) pieces of words[start:end] of at most max_tokens tokens each:
+    the whole span if it fits, else its clauses, else halves down to single words."""
+    tokens = count_tokens(' '.join(words[start:end]))
+    if tokens <= max_tokens or end - start == 1:
+        return [(start, end, tokens)]
+    cuts = [i + 1 for i in range(start, end - 1) if CLAUSE_END.search(words[i])] if clauses else []
+    if not cuts:
+        cuts = [(start + end) // 2]
+    pieces = []
+    for piece_start, piece_end in zip([start] + cuts, cuts + [end]):
+        pieces.extend(split_span(words, piece_start, piece_end, max_tokens, clauses=False))
+    return pieces
+
+def pack_spans(pieces: List[Tuple[int, int, int]], max_tokens: int, overlap_tokens: int) -> Iterator[Tuple[int, int]]:
+    """(start, end) word spans of consecutive pieces totalling at most max_tokens tokens.
     
-    # Process text in overlapping chunks
-    for i in range(0, len(text_with_pages), chunk_size - overlap):
-        try:
-            # Get chunk of words and their page numbers
-            chunk = text_with_pages[i:i + chunk_size]
-            if not chunk:
-                continue
-                
-            # Separate words and page numbers
-            words, pages = zip(*chunk)
-            text_chunk = ' '.join(words)
-            
-            # Determine page range for this chunk
-            unique_pages = sorted(set(pages))
-            if len(unique_pages) == 1:
-                page_str = unique_pages[0]
-            else:
-                page_str = f"{unique_pages[0]}-{unique_pages[-1]}"
-            
+    Each span after the first starts with the trailing pieces of the previous one that fit
+    in overlap_tokens, as long as at least one new piece still fits after them.
+    """
+    first = 0
+    while first < len(pieces):
+        last, total = first, pieces[first][2]
+        while last + 1 < len(pieces) and total + pieces[last + 1][2] <= max_tokens:
+            last += 1
+            total += pieces[last][2]
+        yield pieces[first][0], pieces[last][1]
+        if last + 1 == len(pieces):
+            break
+        following, carried = last + 1, 0
+        while (following - 1 > first and carried + pieces[following - 1][2] <= overlap_tokens
+               and carried + pieces[following - 1][2] + pieces[last + 1][2] <= max_tokens):
+            following -= 1
+            carried += pieces[following][2]
+        first = following
+
+def chunk_sentences(text_with_pages: List[tuple], max_tokens: int = CHUNK_MAX_TOKENS,
+                    overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> Iterator[Tuple[str, str]]:
+    """Yield (text, page range) for chunks of whole sentences of at most max_tokens tokens.
+    
+    As in chunk_text, chunks restart at the first word of every page. A sentence left open at
+    a page break is finished from the next page (never past its end), so a page's chunks only
+    depend on that page and the opening words of the next one.
+    """
+    words = [word for word, _ in text_with_pages]
+    spans = list(page_spans(text_with_pages))
+    for n, (page_start, page_end) in enumerate(spans):
+        end = page_end
+        next_page_end = spans[n + 1][1] if n + 1 < len(spans) else page_end
+        while end < next_page_end and not ends_sentence(words, end - 1):
+            end += 1
+        
+        pieces = []
+        sentence_start = page_start
+        for i in range(page_start, end):
+            if i == end - 1 or ends_sentence(words, i):
+                pieces.extend(split_span(words, sentence_start, i + 1, max_tokens))
+                sentence_start = i + 1
+        
+        for start, stop in pack_spans(pieces, max_tokens, overlap_tokens):
+            # Spans starting on the next page are produced again as that page's chunks
+            if start >= page_end:
+                break
+            text_chunk = ' '.join(words[start:stop])
             if text_chunk.strip():
-                vector = text_model.encode(text_chunk, convert_to_tensor=False).tolist()
-                vectors.append({
-                    "vector": vector,
-                    "text": text_chunk,
-                    "page_number": page_str
-                })
+                yield text_chunk, page_range(text_with_pages[start:stop])
+
+# Chunkers selectable with CHUNKER; each maps word-page tuples to (text, page range) chunks
+CHUNKERS: Dict[str, Callable[[List[tuple]], Iterator[Tuple[str, str]]]] = {
+    "words": chunk_text,
+    "sentences": chunk_sentences,
+}
+
+def chunk_document(text_with_pages: List[tuple], chunker: str = CHUNKER) -> List[Tuple[str, str]]:
+    """Split a document with the named chunker."""
+    if chunker not in CHUNKERS:
+        raise ValueError(f"Unknown chunker {chunker!r}; expected one of {', '.join(CHUNKERS)}")
+    return list(CHUNKERS[chunker](text_with_pages))
+
+def encode_batch(texts: List[str], batch_size: int) -> List[Optional[List[float]]]:
+    """Encode a batch of chunk texts, falling back to one at a time if the batch fails."""
+    try:
+        return embedding_cache.encode(texts, batch_size=batch_size, kind="chunk").tolist()
+    except Exception as e:
+        print(f"Error encoding batch of {len(texts)} chunks, retrying individually: {e}")
+    
+    vectors = []
+    for text in texts:
+        try:
+            vectors.append(embedding_cache.encode(text, kind="chunk").tolist())
         except Exception as e:
             print(f"Error processing text chunk: {e}")
+            vectors.append(None)
+    return vectors
+
+def text_to_vector(text_with_pages: List[tuple], batch_size: int = EMBED_BATCH_SIZE,
+                   progress_callback: Optional[Callable[[int, int], None]] = None,
+                   stats: Optional[Dict] = None, reuse: Optional[Dict[str, object]] = None) -> List[Dict]:
+    """Converts text to vectors using chunks from chunk_document, encoded in batches.
+    
+    Chunks nearly identical to an earlier chunk of the document are dropped before encoding.
+    Chunks whose text is a key of `reuse` (see load_chunk_vectors) take that vector instead
+    of being encoded again. progress_callback(done, total) is called after every batch; if a
+    stats dict is given it receives the chunk counts, elapsed seconds and chunks per second.
+    """
+    vectors = []
+    
+    if not text_with_pages:
+        return vectors
+    
+    start = time.perf_counter()
+    dedupe_stats = {}
+    chunks = drop_near_duplicates(chunk_document(text_with_pages), stats=dedupe_stats)
+    reuse = reuse or {}
+    to_encode = [i for i, (text_chunk, _) in enumerate(chunks) if text_chunk not in reuse]
+    reused = len(chunks) - len(to_encode)
+    
+    # Only one batch of embeddings is materialized at a time besides the results
+    encoded = {}
+    for i in range(0, len(to_encode), batch_size):
+        batch = to_encode[i:i + batch_size]
+        encoded.update(zip(batch, encode_batch([chunks[j][0] for j in batch], batch_size)))
+        if progress_callback:
+            progress_callback(reused + min(i + batch_size, len(to_encode)), len(chunks))
+    if progress_callback and not to_encode:
+        progress_callback(len(chunks), len(chunks))
+    
+    for i, (text_chunk, page_str) in enumerate(chunks):
+        vector = encoded[i] if i in encoded else reuse[text_chunk]
+        if vector is None:
             continue
+        vectors.append({
+            "vector": vector,
+            "text": text_chunk,
+            "page_number": page_str
+        })
+    
+    elapsed = time.perf_counter() - start
+    chunks_per_second = len(vectors) / elapsed if elapsed > 0 else 0.0
+    print(f"Embedded {len(to_encode)} chunks, reused {reused} and skipped "
+          f"{dedupe_stats['chunks_deduplicated']} near-duplicates in {elapsed:.2f}s "
+          f"({chunks_per_second:.1f} chunks/s, batch size {batch_size})")
+    if stats is not None:
+        stats.update({
+            "chunks": len(vectors),
+            "chunks_embedded": len(to_encode),
+            "chunks_reused": reused,
+            "chunks_deduplicated": dedupe_stats["chunks_deduplicated"],
+            "embedding_seconds": round(elapsed, 3),
+            "chunks_per_second": round(chunks_per_second, 1)
+        })
     
     return vectors
 
-def store_in_database(pdf_name: str, pdf_bytes: bytes, vectors: List[Dict], pdf_info: str) -> bool:
+def chunk_rows(pdf_name: str, vectors: List[Dict]) -> List[tuple]:
+    """Convert text_to_vector output into pdf_chunks rows."""
+    rows = []
+    for chunk_id, vec_info in enumerate(vectors):
+        page_start, page_end = parse_page_range(vec_info['page_number'])
+        rows.append((pdf_name, chunk_id, page_start, page_end, vec_info['text'],
+                     psycopg2.Binary(vector_to_blob(vec_info['vector']))))
+    return rows
+
+def write_chunks(cur, pdf_name: str, vectors: List[Dict]):
+    """Replace all pdf_chunks rows of one PDF inside the caller's transaction."""
+    cur.execute("DELETE FROM pdf_chunks WHERE pdf_name = %s", (pdf_name,))
+    execute_values(cur, """
+        INSERT INTO pdf_chunks (pdf_name, chunk_id, page_start, page_end, text, embedding)
+        VALUES %s
+    """, chunk_rows(pdf_name, vectors), page_size=500)
+
+def write_pages(cur, pdf_name: str, page_hashes: Dict[int, str]):
+    """Replace all pdf_pages rows of one PDF inside the caller's transaction."""
+    cur.execute("DELETE FROM pdf_pages WHERE pdf_name = %s", (pdf_name,))
+    execute_values(cur, """
+        INSERT INTO pdf_pages (pdf_name, page_number, text_hash)
+        VALUES %s
+    """, [(pdf_name, page, text_hash) for page, text_hash in page_hashes.items()], page_size=500)
+
+def write_document(cur, pdf_name: str, pdf_bytes: bytes, vectors: List[Dict], pdf_info: str,
+                   file_hash: Optional[str] = None, page_hashes: Optional[Dict[int, str]] = None,
+                   ingest_stats: Optional[Dict] = None):
+    """Upsert one PDF and replace its chunks and page hashes inside the caller's transaction.
+    
+    With a blob store configured the file is written there and the row keeps only its hash.
+    Returns the document's routing representatives for the vector index.
+    """
+    file_hash = file_hash or hash_file(pdf_bytes)
+    blob_hash = blob_store.put(pdf_bytes, file_hash) if blob_store else None
+    pdf_file = None if blob_hash else psycopg2.Binary(pdf_bytes)
+    representatives = vector_index.document_representatives(vectors_to_matrix(vectors))
+    cur.execute("""
+        INSERT INTO pdfdata (pdf_name, pdf_file, blob_hash, text_vectors, embeddings, embedding_dim, embedding_model,
+                             pdf_info, file_hash, summary_vectors, ingest_stats)
+        VALUES (%s, %s, %s, NULL, NULL, NULL, %s, %s, %s, %s, %s)
+        ON CONFLICT (pdf_name) DO UPDATE
+        SET pdf_file = EXCLUDED.pdf_file,
+            blob_hash = EXCLUDED.blob_hash,
+            text_vectors = NULL,
+            embeddings = NULL,
+            embedding_dim = NULL,
+            embedding_model = EXCLUDED.embedding_model,
+            pdf_info = EXCLUDED.pdf_info,
+            file_hash = EXCLUDED.file_hash,
+            summary_vectors = EXCLUDED.summary_vectors,
+            ingest_stats = EXCLUDED.ingest_stats
+    """, (pdf_name, pdf_file, blob_hash, model_registry.model_version(), pdf_info, file_hash,
+          psycopg2.Binary(vector_to_blob(representatives)), json.dumps(ingest_stats) if ingest_stats else None))
+    write_chunks(cur, pdf_name, vectors)
+    write_pages(cur, pdf_name, page_hashes or {})
+    return representatives
+
+def store_in_database(pdf_name: str, pdf_bytes: bytes, vectors: List[Dict], pdf_info: str,
+                      file_hash: Optional[str] = None, page_hashes: Optional[Dict[int, str]] = None,
+                      ingest_stats: Optional[Dict] = None) -> bool:
     """Stores data in PostgreSQL database"""
+    file_hash = file_hash or hash_file(pdf_bytes)
     conn = get_db_connection()
     cur = conn.cursor()
     
     try:
         # Insert into pdfdata
-        cur.execute("""
-            INSERT INTO pdfdata (pdf_name, pdf_file, text_vectors, pdf_info)
-            VALUES (%s, %s, %s, %s)
-            ON CONFLICT (pdf_name) DO UPDATE
-            SET pdf_file = EXCLUDED.pdf_file,
-                text_vectors = EXCLUDED.text_vectors,
-                pdf_info = EXCLUDED.pdf_info
-        """, (pdf_name, psycopg2.Binary(pdf_bytes), json.dumps(vectors), pdf_info))
+        representatives = write_document(cur, pdf_name, pdf_bytes, vectors, pdf_info, file_hash, page_hashes,
+                                         ingest_stats)
         
         conn.commit()
+        vector_index.index.add_document(pdf_name, vectors, pdf_info, representatives, file_hash)
+        semantic_cache.bump_corpus_version()
         return True
     except Exception as e:
         print(f"Database error: {e}")
@@ -137,22 +491,358 @@ def store_in_database(pdf_name: str, pdf_bytes: bytes, vectors: List[Dict], pdf_
         cur.close()
         conn.close()
 
-def search_pdfs(search_query: Optional[str] = None) -> List[Dict]:
-    """Search PDFs in database"""
+def store_documents(documents: List[Tuple[str, bytes, List[Dict], str, str, Dict[int, str], Dict]]) -> Dict[str, Optional[str]]:
+    """Store several (pdf_name, pdf_bytes, vectors, pdf_info, file_hash, page_hashes, ingest_stats)
+    documents in one transaction.
+    
+    Each document is written under its own savepoint, so one failing PDF does not
+    discard the others. Returns the error message per PDF name, None for success.
+    """
+    errors: Dict[str, Optional[str]] = {}
+    if not documents:
+        return errors
+    representatives = {}
     conn = get_db_connection()
     cur = conn.cursor()
     
     try:
-        if search_query:
-            cur.execute("""
-                SELECT pdf_name, pdf_info FROM pdfdata 
-                WHERE pdf_name ILIKE %s OR pdf_info ILIKE %s
-            """, (f'%{search_query}%', f'%{search_query}%'))
-        else:
+        for pdf_name, pdf_bytes, vectors, pdf_info, file_hash, page_hashes, ingest_stats in documents:
+            cur.execute("SAVEPOINT store_document")
+            try:
+                representatives[pdf_name] = write_document(cur, pdf_name, pdf_bytes, vectors, pdf_info,
+                                                           file_hash, page_hashes, ingest_stats)
+                cur.execute("RELEASE SAVEPOINT store_document")
+                errors[pdf_name] = None
+            except Exception as e:
+                print(f"Database error for {pdf_name}: {e}")
+                cur.execute("ROLLBACK TO SAVEPOINT store_document")
+                errors[pdf_name] = str(e)
+        conn.commit()
+    except Exception as e:
+        print(f"Database error: {e}")
+        conn.rollback()
+        return {document[0]: str(e) for document in documents}
+    finally:
+        cur.close()
+        conn.close()
+    
+    for pdf_name, _, vectors, pdf_info, file_hash, _, _ in documents:
+        if errors[pdf_name] is None:
+            vector_index.index.add_document(pdf_name, vectors, pdf_info, representatives[pdf_name], file_hash)
+    semantic_cache.bump_corpus_version()
+    return errors
+
+def get_stored_hashes(pdf_name: str) -> Optional[Dict]:
+    """File and page hashes of the stored version of a PDF.
+
+    None when the PDF is new or its vectors came from a different embedding model,
+    since nothing from such a version can be reused.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("""
+            SELECT file_hash, embedding_model FROM pdfdata WHERE pdf_name = %s
+        """, (pdf_name,))
+        row = cur.fetchone()
+        if not row or row[1] != model_registry.model_version():
+            return None
+        cur.execute("""
+            SELECT page_number, text_hash FROM pdf_pages WHERE pdf_name = %s
+        """, (pdf_name,))
+        return {"file_hash": row[0], "page_hashes": dict(cur.fetchall())}
+    finally:
+        cur.close()
+        conn.close()
+
+def load_chunk_vectors(pdf_name: str) -> Dict[str, object]:
+    """Stored vector of every chunk text of a PDF, for text_to_vector(reuse=...)."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("""
+            SELECT text, embedding FROM pdf_chunks WHERE pdf_name = %s
+        """, (pdf_name,))
+        return {text: blob_to_vector(embedding) for text, embedding in cur.fetchall()}
+    finally:
+        cur.close()
+        conn.close()
+
+def migrate_to_chunk_table() -> int:
+    """Move per-document vectors (JSON or binary layout) into pdf_chunks, one PDF per transaction.
+    
+    Safe to run while the server is live: the index reads both layouts and
+    each PDF row is locked only for its own conversion.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    migrated = 0
+    
+    try:
+        cur.execute("SELECT pdf_name FROM pdfdata WHERE text_vectors IS NOT NULL")
+        pdf_names = [row[0] for row in cur.fetchall()]
+        
+        for pdf_name in pdf_names:
+            try:
+                cur.execute("""
+                    SELECT text_vectors, embeddings, embedding_dim FROM pdfdata
+                    WHERE pdf_name = %s AND text_vectors IS NOT NULL
+                    FOR UPDATE
+                """, (pdf_name,))
+                row = cur.fetchone()
+                if not row:
+                    conn.rollback()
+                    continue
+                
+                matrix, chunks = decode_document(*row)
+                vectors = [dict(chunk, vector=vector) for chunk, vector in zip(chunks, matrix)]
+                write_chunks(cur, pdf_name, vectors)
+                cur.execute("""
+                    UPDATE pdfdata
+                    SET text_vectors = NULL, embeddings = NULL, embedding_dim = NULL
+                    WHERE pdf_name = %s
+                """, (pdf_name,))
+                conn.commit()
+                migrated += 1
+                print(f"Migrated {len(vectors)} chunks of {pdf_name} to pdf_chunks")
+            except Exception as e:
+                print(f"Migration error for {pdf_name}: {e}")
+                conn.rollback()
+        
+        return migrated
+    finally:
+        cur.close()
+        conn.close()
+
+def migrate_to_blob_store() -> int:
+    """Move original files from pdfdata.pdf_file into the blob store, one PDF per transaction.
+    
+    Rows keep serving from the database until their own conversion commits, so this is safe
+    to run while the server is live. The table needs a VACUUM FULL afterwards to shrink on disk.
+    """
+    if blob_store is None:
+        raise RuntimeError("BLOB_STORE_DIR is not set")
+    conn = get_db_connection()
+    cur = conn.cursor()
+    migrated = 0
+    
+    try:
+        cur.execute("SELECT pdf_name FROM pdfdata WHERE pdf_file IS NOT NULL")
+        pdf_names = [row[0] for row in cur.fetchall()]
+        
+        for pdf_name in pdf_names:
+            try:
+                cur.execute("""
+                    SELECT pdf_file FROM pdfdata
+                    WHERE pdf_name = %s AND pdf_file IS NOT NULL
+                    FOR UPDATE
+                """, (pdf_name,))
+                row = cur.fetchone()
+                if not row:
+                    conn.rollback()
+                    continue
+                
+                pdf_bytes = bytes(row[0])
+                blob_hash = blob_store.put(pdf_bytes)
+                cur.execute("""
+                    UPDATE pdfdata
+                    SET pdf_file = NULL, blob_hash = %s, file_hash = COALESCE(file_hash, %s)
+                    WHERE pdf_name = %s
+                """, (blob_hash, blob_hash, pdf_name))
+                conn.commit()
+                migrated += 1
+                print(f"Moved {pdf_name} ({len(pdf_bytes) / 1e6:.1f} MB) to blob {blob_hash}")
+            except Exception as e:
+                print(f"Migration error for {pdf_name}: {e}")
+                conn.rollback()
+        
+        return migrated
+    finally:
+        cur.close()
+        conn.close()
+
+def referenced_blobs() -> set:
+    """Blob hashes still referenced by a pdfdata row."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    try:
+        cur.execute("SELECT DISTINCT blob_hash FROM pdfdata WHERE blob_hash IS NOT NULL")
+        return {row[0] for row in cur.fetchall()}
+    finally:
+        cur.close()
+        conn.close()
+
+def get_pdf_file_info(pdf_name: str) -> Optional[Dict]:
+    """Where a PDF's original file is stored and its size in bytes, without reading it."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    try:
+        cur.execute("""
+            SELECT blob_hash, octet_length(pdf_file) FROM pdfdata WHERE pdf_name = %s
+        """, (pdf_name,))
+        row = cur.fetchone()
+        if not row or (row[0] is None and row[1] is None):
+            return None
+        blob_hash, size = row
+        if blob_hash:
+            size = blob_store.size(blob_hash) if blob_store else None
+        return {"blob_hash": blob_hash, "size": size}
+    finally:
+        cur.close()
+        conn.close()
+
+def read_pdf_range(pdf_name: str, start: int, end: int) -> bytes:
+    """Bytes [start, end] of a PDF kept in pdfdata.pdf_file, sliced by the database."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    try:
+        # substring() on bytea is 1-based
+        cur.execute("""
+            SELECT substring(pdf_file FROM %s FOR %s) FROM pdfdata WHERE pdf_name = %s
+        """, (start + 1, end - start + 1, pdf_name))
+        row = cur.fetchone()
+        return bytes(row[0]) if row and row[0] is not None else b""
+    finally:
+        cur.close()
+        conn.close()
+
+def get_chunk(pdf_name: str, chunk_id: int) -> Optional[Dict]:
+    """Fetch a single chunk for citation display."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    try:
+        cur.execute("""
+            SELECT page_start, page_end, text FROM pdf_chunks
+            WHERE pdf_name = %s AND chunk_id = %s
+        """, (pdf_name, chunk_id))
+        row = cur.fetchone()
+        if not row:
+            return None
+        return {
+            "pdf_name": pdf_name,
+            "chunk_id": chunk_id,
+            "page_number": format_page_range(row[0], row[1]),
+            "text": row[2]
+        }
+    finally:
+        cur.close()
+        conn.close()
+
+def get_ingest_stats(pdf_name: str) -> Optional[Dict]:
+    """What the last ingestion of a PDF removed and embedded; None for unknown PDFs."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    try:
+        cur.execute("SELECT ingest_stats FROM pdfdata WHERE pdf_name = %s", (pdf_name,))
+        row = cur.fetchone()
+        if not row:
+            return None
+        return {"pdf_name": pdf_name, **(row[0] or {})}
+    finally:
+        cur.close()
+        conn.close()
+
+def fuse_rankings(rankings: List[List[str]], k: int = SEARCH_RRF_K) -> Dict[str, float]:
+    """Reciprocal rank fusion: every ranked list adds 1 / (k + rank) to each name in it."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, name in enumerate(ranking, 1):
+            scores[name] = scores.get(name, 0.0) + 1.0 / (k + rank)
+    return scores
+
+def semantic_ranking(search_query: str, limit: int) -> List[Dict]:
+    """PDFs whose best chunk is close enough to the query embedding, most similar first."""
+    if len(search_query) < SEARCH_MIN_SEMANTIC_LENGTH:
+        return []
+    # Through the embedding cache, so a query retyped or revisited is not encoded again
+    query_vector = embedding_cache.encode(search_query, kind="query").tolist()
+    scores = [s for s in vector_index.get_vector_index().document_scores(query_vector)
+              if s["max_similarity"] >= SEARCH_MIN_SIMILARITY]
+    scores.sort(key=lambda s: s["max_similarity"], reverse=True)
+    return scores[:limit]
+
+def search_pdfs(search_query: Optional[str] = None, limit: int = SEARCH_RESULT_LIMIT) -> List[Dict]:
+    """Search PDFs by name, info and chunk text, fused with embedding similarity.
+    
+    Name/info substrings use trigram indexes and chunk text the full-text GIN index; the
+    rankings are combined by reciprocal rank fusion. PDFs matching the query literally
+    (name, info or the exact phrase in a chunk) rank ahead of purely semantic matches.
+    """
+    search_query = (search_query or "").strip()
+    semantic = semantic_ranking(search_query, limit) if search_query else []
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    try:
+        if not search_query:
             cur.execute("SELECT pdf_name, pdf_info FROM pdfdata")
-            
-        results = cur.fetchall()
-        return [{"name": row[0], "info": row[1]} for row in results]
+            return [{"name": row[0], "info": row[1]} for row in cur.fetchall()]
+        
+        pattern = f'%{search_query}%'
+        cur.execute("""
+            SELECT pdf_name, pdf_info FROM pdfdata
+            WHERE pdf_name ILIKE %s OR pdf_info ILIKE %s
+            ORDER BY pdf_name ILIKE %s DESC, pdf_name
+            LIMIT %s
+        """, (pattern, pattern, pattern, limit))
+        metadata_rows = cur.fetchall()
+        
+        # PDFs are ranked on the tsvectors alone; chunk text is read only for the best chunk
+        # of each PDF returned, since common terms match most of the corpus
+        cur.execute("""
+            WITH q AS (
+                SELECT plainto_tsquery('english', %s) AS words, phraseto_tsquery('english', %s) AS phrase
+            ), best AS (
+                SELECT pdf_name,
+                       bool_or(text_tsv @@ q.phrase) AS exact,
+                       max(ts_rank_cd(text_tsv, q.words)) AS rank
+                FROM pdf_chunks, q
+                WHERE text_tsv @@ q.words
+                GROUP BY pdf_name
+                ORDER BY exact DESC, rank DESC
+                LIMIT %s
+            )
+            SELECT best.pdf_name, best.exact, snippet.text
+            FROM best, q, LATERAL (
+                SELECT text FROM pdf_chunks c
+                WHERE c.pdf_name = best.pdf_name AND c.text_tsv @@ q.words
+                ORDER BY ts_rank_cd(c.text_tsv, q.words) DESC
+                LIMIT 1
+            ) snippet
+            ORDER BY best.exact DESC, best.rank DESC
+        """, (search_query, search_query, limit))
+        text_rows = cur.fetchall()
+        
+        infos = dict(metadata_rows)
+        snippets = {s["name"]: s["best_matching_text"] for s in semantic}
+        snippets.update((name, snippet) for name, _, snippet in text_rows)
+        exact = {name for name, _ in metadata_rows} | {name for name, is_exact, _ in text_rows if is_exact}
+        scores = fuse_rankings([
+            [name for name, _ in metadata_rows],
+            [name for name, _, _ in text_rows],
+            [s["name"] for s in semantic]
+        ])
+        
+        names = sorted(scores, key=lambda name: (name in exact, scores[name]), reverse=True)[:limit]
+        missing = [name for name in names if name not in infos]
+        if missing:
+            cur.execute("SELECT pdf_name, pdf_info FROM pdfdata WHERE pdf_name = ANY(%s)", (missing,))
+            infos.update(cur.fetchall())
+        
+        # Index entries can briefly outlive a deleted row
+        return [{
+            "name": name,
+            "info": infos[name],
+            "score": round(scores[name], 5),
+            "snippet": snippets.get(name)
+        } for name in names if name in infos]
     finally:
         cur.close()
         conn.close()
@@ -165,6 +855,8 @@ def delete_pdf(pdf_name: str) -> bool:
     try:
         cur.execute("DELETE FROM pdfdata WHERE pdf_name = %s", (pdf_name,))
         conn.commit()
+        vector_index.index.remove_document(pdf_name)
+        semantic_cache.bump_corpus_version()
         return True
     except Exception as e:
         print(f"Delete error: {e}")
@@ -186,6 +878,8 @@ def update_pdf_info(pdf_name: str, new_info: str) -> bool:
             WHERE pdf_name = %s
         """, (new_info, pdf_name))
         conn.commit()
+        vector_index.index.update_document_info(pdf_name, new_info)
+        semantic_cache.bump_corpus_version()
         return True
     except Exception as e:
         print(f"Update error: {e}")
@@ -0,0 +1,579 @@
+import hashlib
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from db import get_db_connection
+from embedding_store import blob_to_matrix, blob_to_vector, decode_document, format_page_range, vectors_to_matrix
+from model_registry import model_version
+from quantization import (
+    INDEX_QUANTIZATION,
+    RESCORE_FACTOR,
+    RESCORE_MARGIN,
+    SpillStore,
+    approximate_scores,
+    dequantize_rows,
+    quantize_rows,
+)
+from semantic_cache import semantic_cache
+from similarity import normalize_rows, normalize_vector, select_top_chunks, top_k_indices
+
+# Index configuration
+# Below this many chunks every query is answered by an exact scan; above it the IVF lists are probed
+FLAT_SEARCH_LIMIT = int(os.getenv("INDEX_FLAT_SEARCH_LIMIT", "20000"))
+IVF_NPROBE = int(os.getenv("INDEX_NPROBE", "16"))
+IVF_MIN_LISTS = 16
+IVF_MAX_LISTS = 4096
+IVF_TRAIN_ITERATIONS = 10
+IVF_TRAIN_SAMPLE = 50000
+ASSIGN_BLOCK_SIZE = 65536
+LOAD_BATCH_SIZE = 5000
+# Document routing: k-means representatives kept per PDF, and how many PDFs the first stage
+# shortlists for exact chunk scoring (0 scores every chunk of every PDF)
+DOC_REPRESENTATIVES = int(os.getenv("INDEX_DOC_REPRESENTATIVES", "8"))
+DOC_SHORTLIST = int(os.getenv("INDEX_DOC_SHORTLIST", "20"))
+# Seconds between checks of the shared corpus version, which every PDF write bumps, so
+# documents written by other workers or the bulk ingest CLI reach this process's index
+VERSION_CHECK_INTERVAL = float(os.getenv("INDEX_VERSION_CHECK_INTERVAL", "1.0"))
+
+def info_digest(pdf_info) -> str:
+    """MD5 of pdf_info as Postgres md5(coalesce(pdf_info, '')) computes it."""
+    return hashlib.md5((pdf_info if isinstance(pdf_info, str) else "").encode("utf-8")).hexdigest()
+
+def train_centroids(matrix: np.ndarray, nlist: int, iterations: int = IVF_TRAIN_ITERATIONS, seed: int = 0) -> np.ndarray:
+    """Train unit-length k-means centroids on a sample of (normalized) rows."""
+    rng = np.random.default_rng(seed)
+    if len(matrix) > IVF_TRAIN_SAMPLE:
+        matrix = matrix[rng.choice(len(matrix), IVF_TRAIN_SAMPLE, replace=False)]
+    nlist = min(nlist, len(matrix))
+    centroids = matrix[rng.choice(len(matrix), nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = np.argmax(matrix @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, matrix)
+        counts = np.bincount(assignments, minlength=nlist)
+        # Keep the previous centroid for empty clusters
+        empty = counts == 0
+        sums[empty] = centroids[empty]
+        centroids = normalize_rows(sums)
+
+    return centroids.astype(np.float32)
+
+def assign_to_centroids(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Return the nearest centroid for every row, working in blocks to bound memory."""
+    assignments = np.empty(len(matrix), dtype=np.int32)
+    for start in range(0, len(matrix), ASSIGN_BLOCK_SIZE):
+        block = matrix[start:start + ASSIGN_BLOCK_SIZE]
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+def document_representatives(matrix: np.ndarray, k: int = DOC_REPRESENTATIVES) -> np.ndarray:
+    """Unit-length k-means centroids of one PDF's chunk vectors, used to route queries to it."""
+    if len(matrix) == 0:
+        return np.empty((0, 0), dtype=np.float32)
+    return train_centroids(normalize_rows(matrix.astype(np.float32)), k)
+
+class VectorIndex:
+    """Resident IVF index over every chunk embedding stored in pdfdata.
+
+    With quantization="int8" candidates are scored on int8 codes and the best ones rescored
+    against the exact vectors, which are memory-mapped from disk instead of held in RAM.
+    """
+
+    def __init__(self, nprobe: int = IVF_NPROBE, flat_limit: int = FLAT_SEARCH_LIMIT,
+                 quantization: str = INDEX_QUANTIZATION, rescore_factor: int = RESCORE_FACTOR,
+                 version_source: Optional[Callable[[], int]] = None):
+        if quantization not in ("none", "int8"):
+            raise ValueError(f"Unknown index quantization: {quantization}")
+        self.nprobe = nprobe
+        self.flat_limit = flat_limit
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self._spill = SpillStore() if quantization == "int8" else None
+        self._lock = threading.RLock()
+        self._loaded = False
+        # Corpus version the index reflects; without a version_source the index never refreshes
+        self.version_source = version_source
+        self._version: Optional[int] = None
+        self._version_checked = 0.0
+        self._refresh_lock = threading.Lock()
+        # pdf_name -> {"vectors", "mean", "representatives", "chunk_ids", "texts", "pages", "pdf_info", "lists"},
+        # plus "codes" and "scales" when quantized ("vectors" is then a memory map)
+        self._docs: Dict[str, dict] = {}
+        self._dirty = True
+        self._centroids: Optional[np.ndarray] = None
+        self._trained_size = 0
+        # Flattened view, rebuilt lazily after the document set changes
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._doc_vectors: List[np.ndarray] = []
+        self._row_doc = np.empty(0, dtype=np.int32)
+        self._doc_names: List[str] = []
+        self._doc_offsets = np.zeros(1, dtype=np.int64)
+        self._list_rows: List[np.ndarray] = []
+        self._doc_means = np.empty((0, 0), dtype=np.float32)
+        self._rep_matrix = np.empty((0, 0), dtype=np.float32)
+        self._rep_doc = np.empty(0, dtype=np.int32)
+
+    def ensure_loaded(self):
+        """Build the index from pdfdata the first time it is needed."""
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                self.load_from_database()
+
+    def _current_version(self) -> Optional[int]:
+        if self.version_source is None:
+            return None
+        try:
+            return self.version_source()
+        except Exception as e:
+            print(f"Error reading corpus version: {e}")
+            return None
+
+    def _load_chunks(self, conn, metadata: Dict[str, tuple], names: Optional[List[str]] = None) -> Dict[str, dict]:
+        """Entries built from pdf_chunks for the given PDFs, or all of them.
+
+        metadata maps pdf_name to (pdf_info, summary_vectors, file_hash). Chunks arrive ordered
+        by PDF, so only one document is buffered at a time.
+        """
+        docs = {}
+        with conn.cursor(name="vector_index_load") as cur:
+            cur.itersize = LOAD_BATCH_SIZE
+            if names is None:
+                cur.execute("""
+                    SELECT pdf_name, chunk_id, page_start, page_end, text, embedding
+                    FROM pdf_chunks
+                    ORDER BY pdf_name, chunk_id
+                """)
+            else:
+                cur.execute("""
+                    SELECT pdf_name, chunk_id, page_start, page_end, text, embedding
+                    FROM pdf_chunks WHERE pdf_name = ANY(%s)
+                    ORDER BY pdf_name, chunk_id
+                """, (names,))
+            current, vectors, chunks = None, [], []
+            for pdf_name, chunk_id, page_start, page_end, text, embedding in cur:
+                if pdf_name != current:
+                    if chunks:
+                        docs[current] = self._make_entry(np.stack(vectors), chunks, *metadata.get(current, (None,) * 3))
+                    current, vectors, chunks = pdf_name, [], []
+                vectors.append(blob_to_vector(embedding))
+                chunks.append({
+                    "chunk_id": chunk_id,
+                    "text": text,
+                    "page_number": format_page_range(page_start, page_end)
+                })
+            if chunks:
+                docs[current] = self._make_entry(np.stack(vectors), chunks, *metadata.get(current, (None,) * 3))
+        return docs
+
+    def _load_legacy(self, conn, metadata: Dict[str, tuple], names: Optional[List[str]] = None) -> Dict[str, dict]:
+        """Entries for PDFs not yet moved to pdf_chunks by migrate_to_chunk_table, for the
+        given PDFs or all of them. metadata is as for _load_chunks."""
+        docs = {}
+        with conn.cursor(name="vector_index_load_legacy") as cur:
+            cur.itersize = 10
+            if names is None:
+                cur.execute("""
+                    SELECT pdf_name, text_vectors, embeddings, embedding_dim, pdf_info
+                    FROM pdfdata WHERE text_vectors IS NOT NULL
+                """)
+            else:
+                cur.execute("""
+                    SELECT pdf_name, text_vectors, embeddings, embedding_dim, pdf_info
+                    FROM pdfdata WHERE text_vectors IS NOT NULL AND pdf_name = ANY(%s)
+                """, (names,))
+            for pdf_name, text_vectors, embeddings, embedding_dim, pdf_info in cur:
+                matrix, chunks = decode_document(text_vectors, embeddings, embedding_dim)
+                entry = self._make_entry(matrix, chunks, pdf_info, file_hash=metadata.get(pdf_name, (None,) * 3)[2])
+                if entry:
+                    docs[pdf_name] = entry
+        return docs
+
+    def load_from_database(self):
+        """(Re)build the whole index, streaming chunks from pdf_chunks with a server-side cursor."""
+        # Read before loading: a write during the load bumps it again and is picked up by refresh
+        version = self._current_version()
+        conn = get_db_connection()
+        try:
+            metadata = {}
+            stale = []
+            with conn.cursor() as cur:
+                cur.execute("SELECT pdf_name, pdf_info, embedding_model, summary_vectors, file_hash FROM pdfdata")
+                for pdf_name, pdf_info, embedding_model, summary_vectors, file_hash in cur.fetchall():
+                    metadata[pdf_name] = (pdf_info, summary_vectors, file_hash)
+                    if embedding_model and embedding_model != model_version():
+                        stale.append(pdf_name)
+            if stale:
+                print(f"Warning: {len(stale)} PDFs were embedded with a different model than {model_version()}: {stale[:10]}")
+
+            docs = self._load_chunks(conn, metadata)
+            docs.update(self._load_legacy(conn, metadata))
+            conn.commit()
+
+            with self._lock:
+                for entry in self._docs.values():
+                    self._release(entry)
+                self._docs = {name: entry for name, entry in docs.items() if entry}
+                self._centroids = None
+                self._dirty = True
+                self._loaded = True
+                self._version = version
+                self._version_checked = time.monotonic()
+            print(f"Vector index loaded: {len(self._docs)} PDFs, {len(self)} chunks")
+        finally:
+            conn.close()
+
+    def refresh(self, force: bool = False):
+        """Apply PDF writes made by other processes once the corpus version has moved.
+
+        Only PDFs whose file hash or pdf_info differ from the indexed copy are read again;
+        PDFs gone from pdfdata are dropped. Checks are throttled to VERSION_CHECK_INTERVAL and
+        skipped while another thread is refreshing.
+        """
+        if not self._loaded or self.version_source is None:
+            return
+        if not force and time.monotonic() - self._version_checked < VERSION_CHECK_INTERVAL:
+            return
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self._version_checked = time.monotonic()
+            version = self._current_version()
+            if version is None or version == self._version:
+                return
+            self._sync_from_database()
+            self._version = version
+        except Exception as e:
+            print(f"Error refreshing vector index: {e}")
+        finally:
+            self._refresh_lock.release()
+
+    def _sync_from_database(self):
+        """Reload the PDFs that changed in pdfdata and drop the deleted ones."""
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pdf_name, file_hash, md5(coalesce(pdf_info, '')) FROM pdfdata")
+                stored = {pdf_name: (file_hash, info_hash) for pdf_name, file_hash, info_hash in cur.fetchall()}
+            with self._lock:
+                indexed = {name: (entry["file_hash"], info_digest(entry["pdf_info"]))
+                           for name, entry in self._docs.items()}
+            removed = [name for name in indexed if name not in stored]
+            changed = [name for name, hashes in stored.items() if indexed.get(name) != hashes]
+
+            docs = {}
+            if changed:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        SELECT pdf_name, pdf_info, summary_vectors, file_hash FROM pdfdata WHERE pdf_name = ANY(%s)
+                    """, (changed,))
+                    metadata = {row[0]: row[1:] for row in cur.fetchall()}
+                docs = self._load_chunks(conn, metadata, changed)
+                docs.update(self._load_legacy(conn, metadata, changed))
+            conn.commit()
+        finally:
+            conn.close()
+
+        with self._lock:
+            for name in removed + changed:
+                old = self._docs.pop(name, None)
+                if old is not None:
+                    self._release(old)
+                if docs.get(name):
+                    self._docs[name] = docs[name]
+            if removed or changed:
+                self._dirty = True
+        if removed or changed:
+            print(f"Vector index refreshed: {len(changed)} PDFs reloaded, {len(removed)} removed")
+
+    def _make_entry(self, matrix: np.ndarray, chunks: List[Dict], pdf_info, representatives=None,
+                    file_hash: Optional[str] = None) -> Optional[dict]:
+        """Convert one PDF's chunk matrix and metadata into an index entry.
+
+        representatives is the pdfdata.summary_vectors blob or matrix written at ingest;
+        PDFs stored before it existed get theirs computed here. file_hash identifies the
+        stored version, so refresh can tell which PDFs changed.
+        """
+        if not chunks or len(matrix) != len(chunks):
+            return None
+        matrix = normalize_rows(matrix.astype(np.float32))
+        if representatives is not None and not isinstance(representatives, np.ndarray):
+            representatives = blob_to_matrix(representatives, matrix.shape[1])
+        if representatives is None or len(representatives) == 0:
+            representatives = document_representatives(matrix)
+        entry = {
+            "vectors": matrix,
+            "mean": matrix.mean(axis=0),
+            "representatives": representatives,
+            "chunk_ids": [c.get('chunk_id', i) for i, c in enumerate(chunks)],
+            "texts": [c['text'] for c in chunks],
+            "pages": [c['page_number'] for c in chunks],
+            "pdf_info": pdf_info if pdf_info else {},
+            "file_hash": file_hash,
+            "lists": None
+        }
+        if self._spill is not None:
+            entry["codes"], entry["scales"] = quantize_rows(matrix)
+            entry["vectors"] = self._spill.write(matrix)
+        return entry
+
+    def _release(self, entry: dict):
+        """Free the spill file of an entry that left the index."""
+        if self._spill is not None:
+            self._spill.release(entry["vectors"])
+
+    def add_document(self, pdf_name: str, vectors: List[Dict], pdf_info: str, representatives=None,
+                     file_hash: Optional[str] = None):
+        """Insert or replace one PDF's chunks."""
+        entry = self._make_entry(vectors_to_matrix(vectors), vectors, pdf_info, representatives, file_hash)
+        with self._lock:
+            old = self._docs.pop(pdf_name, None)
+            if old is not None:
+                self._release(old)
+            if entry:
+                self._docs[pdf_name] = entry
+            self._dirty = True
+
+    def remove_document(self, pdf_name: str):
+        """Drop one PDF's chunks from the index."""
+        with self._lock:
+            entry = self._docs.pop(pdf_name, None)
+            if entry is not None:
+                self._release(entry)
+                self._dirty = True
+
+    def update_document_info(self, pdf_name: str, pdf_info: str):
+        """Refresh the pdf_info returned with a PDF's search hits."""
+        with self._lock:
+            if pdf_name in self._docs:
+                self._docs[pdf_name]["pdf_info"] = pdf_info if pdf_info else {}
+
+    def document_names(self) -> List[str]:
+        """Names of all indexed PDFs."""
+        with self._lock:
+            return list(self._docs.keys())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(d["texts"]) for d in self._docs.values())
+
+    def memory_stats(self) -> Dict:
+        """Bytes of chunk vectors held in RAM, and spilled to disk when quantized."""
+        with self._lock:
+            entries = list(self._docs.values())
+        exact = sum(e["vectors"].nbytes for e in entries)
+        if self._spill is None:
+            return {"quantization": self.quantization, "resident_bytes": exact, "spilled_bytes": 0}
+        resident = sum(e["codes"].nbytes + e["scales"].nbytes for e in entries)
+        return {"quantization": self.quantization, "resident_bytes": resident, "spilled_bytes": exact}
+
+    def _rebuild(self):
+        """Flatten the per-document matrices and refresh the inverted lists."""
+        names = list(self._docs.keys())
+        entries = [self._docs[name] for name in names]
+        sizes = [len(e["texts"]) for e in entries]
+        total = sum(sizes)
+
+        self._doc_names = names
+        self._doc_offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+        if entries:
+            if self._spill is not None:
+                # Only the codes are flattened; exact rows are read from each PDF's memory map
+                self._matrix = np.empty((0, 0), dtype=np.float32)
+                self._codes = np.concatenate([e["codes"] for e in entries])
+                self._scales = np.concatenate([e["scales"] for e in entries])
+                self._doc_vectors = [e["vectors"] for e in entries]
+            else:
+                self._matrix = np.concatenate([e["vectors"] for e in entries])
+            self._row_doc = np.repeat(np.arange(len(entries), dtype=np.int32), sizes)
+            self._doc_means = np.stack([e["mean"] for e in entries])
+            self._rep_matrix = np.concatenate([e["representatives"] for e in entries])
+            self._rep_doc = np.repeat(np.arange(len(entries), dtype=np.int32),
+                                      [len(e["representatives"]) for e in entries])
+        else:
+            self._matrix = np.empty((0, 0), dtype=np.float32)
+            self._codes = self._scales = None
+            self._doc_vectors = []
+            self._row_doc = np.empty(0, dtype=np.int32)
+            self._doc_means = np.empty((0, 0), dtype=np.float32)
+            self._rep_matrix = np.empty((0, 0), dtype=np.float32)
+            self._rep_doc = np.empty(0, dtype=np.int32)
+
+        if total < self.flat_limit:
+            self._centroids = None
+            self._list_rows = []
+        else:
+            # Retrain when the corpus has doubled or halved since the last training run
+            if self._centroids is None or total > 2 * self._trained_size or total < self._trained_size // 2:
+                nlist = int(min(max(math.sqrt(total), IVF_MIN_LISTS), IVF_MAX_LISTS))
+                self._centroids = train_centroids(self._training_sample(total), nlist)
+                self._trained_size = total
+                for e in entries:
+                    e["lists"] = None
+            for e in entries:
+                if e["lists"] is None:
+                    e["lists"] = assign_to_centroids(e["vectors"], self._centroids)
+
+            assignments = np.concatenate([e["lists"] for e in entries])
+            order = np.argsort(assignments, kind="stable")
+            bounds = np.searchsorted(assignments[order], np.arange(len(self._centroids) + 1))
+            self._list_rows = [order[bounds[i]:bounds[i + 1]] for i in range(len(self._centroids))]
+
+        self._dirty = False
+
+    def _training_sample(self, total: int) -> np.ndarray:
+        """Rows to train IVF centroids on; dequantized from a sample when quantized."""
+        if self._codes is None:
+            return self._matrix
+        rows = np.random.default_rng(0).choice(total, min(total, IVF_TRAIN_SAMPLE), replace=False)
+        return normalize_rows(dequantize_rows(self._codes[rows], self._scales[rows]))
+
+    def _scores(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Similarity of the query to each row; an int8 approximation when quantized."""
+        if self._codes is None:
+            return self._matrix[rows] @ query
+        return approximate_scores(self._codes, self._scales, rows, query)
+
+    def _exact_scores(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Full-precision similarity, read from the memory-mapped vectors when quantized."""
+        if self._codes is None:
+            return self._matrix[rows] @ query
+        vectors = np.empty((len(rows), len(query)), dtype=np.float32)
+        for i, row in enumerate(rows):
+            doc_id = self._row_doc[row]
+            vectors[i] = self._doc_vectors[doc_id][row - self._doc_offsets[doc_id]]
+        return vectors @ query
+
+    def _candidate_rows(self, query: np.ndarray, pdf_names: Optional[List[str]]) -> np.ndarray:
+        """Rows to score: the chosen PDFs exactly, the whole corpus when small, else the probed lists."""
+        if pdf_names is not None:
+            name_to_id = {name: i for i, name in enumerate(self._doc_names)}
+            ranges = [
+                np.arange(self._doc_offsets[name_to_id[name]], self._doc_offsets[name_to_id[name] + 1])
+                for name in dict.fromkeys(pdf_names) if name in name_to_id
+            ]
+            return np.concatenate(ranges) if ranges else np.empty(0, dtype=np.int64)
+        if self._centroids is None:
+            return np.arange(len(self._row_doc))
+
+        probe = top_k_indices(self._centroids @ query, self.nprobe)
+        return np.concatenate([self._list_rows[i] for i in probe])
+
+    def _prepare(self, query_vector: List[float]) -> np.ndarray:
+        """Make sure the flattened view is current and return the normalized query."""
+        self.ensure_loaded()
+        if self._dirty:
+            self._rebuild()
+        return normalize_vector(query_vector)
+
+    def search(self, query_vector: List[float], k: int = 5, pdf_names: Optional[List[str]] = None,
+               threshold: float = 0.0, per_document: int = 10) -> List[dict]:
+        """Top-k chunks for the query across the corpus or the given PDFs."""
+        self.refresh()
+        with self._lock:
+            query = self._prepare(query_vector)
+            if len(self._row_doc) == 0:
+                return []
+
+            rows = self._candidate_rows(query, pdf_names)
+            scores = self._scores(rows, query)
+            doc_ids = self._row_doc[rows]
+            if self._codes is not None:
+                # Keep a few times more candidates than needed by int8 score, then rank them exactly
+                keep = select_top_chunks(scores, doc_ids, k * self.rescore_factor, threshold - RESCORE_MARGIN,
+                                         per_document * self.rescore_factor)
+                rows, doc_ids = rows[keep], doc_ids[keep]
+                scores = self._exact_scores(rows, query)
+            selected = select_top_chunks(scores, doc_ids, k, threshold, per_document)
+            return [self._hit(int(rows[i]), float(scores[i])) for i in selected]
+
+    def _hit(self, row: int, similarity: float) -> dict:
+        """Result dict for one chunk row, in the shape search_relevant_texts returns."""
+        doc_id = int(self._row_doc[row])
+        name = self._doc_names[doc_id]
+        entry = self._docs[name]
+        position = row - int(self._doc_offsets[doc_id])
+        return {
+            'pdf_name': name,
+            'chunk_id': entry["chunk_ids"][position],
+            'text': entry["texts"][position],
+            'page_number': entry["pages"][position],
+            'similarity': similarity,
+            'pdf_info': entry["pdf_info"]
+        }
+
+    def _shortlist_rows(self, query: np.ndarray, shortlist: int) -> np.ndarray:
+        """Chunk rows of the PDFs whose representatives and mean best match the query."""
+        # Same weighting as identify_relevant_pdfs, with the best representative standing in
+        # for the best chunk; the mean already gives the exact average chunk similarity
+        best_rep = np.full(len(self._doc_names), -np.inf, dtype=np.float32)
+        np.maximum.at(best_rep, self._rep_doc, self._rep_matrix @ query)
+        coarse = best_rep * 0.7 + (self._doc_means @ query) * 0.3
+        doc_ids = np.sort(top_k_indices(coarse, shortlist))
+        return np.concatenate([
+            np.arange(self._doc_offsets[doc_id], self._doc_offsets[doc_id + 1]) for doc_id in doc_ids
+        ])
+
+    def document_scores(self, query_vector: List[float], shortlist: Optional[int] = None) -> List[dict]:
+        """Max and average chunk similarity per PDF, for documents the query reaches.
+
+        With a shortlist (default DOC_SHORTLIST) the PDFs are first ranked by their
+        representative vectors and only the chunks of the top `shortlist` are scored.
+        """
+        shortlist = DOC_SHORTLIST if shortlist is None else shortlist
+        self.refresh()
+        with self._lock:
+            query = self._prepare(query_vector)
+            if len(self._row_doc) == 0:
+                return []
+
+            if 0 < shortlist < len(self._doc_names):
+                rows = self._shortlist_rows(query, shortlist)
+            else:
+                rows = self._candidate_rows(query, None)
+            scores = self._scores(rows, query)
+            doc_ids = self._row_doc[rows]
+            if self._codes is not None:
+                # Rescore each PDF's best few rows by int8 score to find its exact best chunk
+                keep = select_top_chunks(scores, doc_ids, len(rows), -np.inf, self.rescore_factor)
+                rows, doc_ids = rows[keep], doc_ids[keep]
+                scores = self._exact_scores(rows, query)
+
+            # Best chunk per PDF among the candidate rows
+            best_score = np.full(len(self._doc_names), -np.inf, dtype=np.float32)
+            np.maximum.at(best_score, doc_ids, scores)
+            best_row = np.full(len(self._doc_names), -1, dtype=np.int64)
+            is_best = scores >= best_score[doc_ids]
+            best_row[doc_ids[is_best]] = rows[is_best]
+
+            results = []
+            for doc_id in np.nonzero(best_row >= 0)[0]:
+                name = self._doc_names[doc_id]
+                entry = self._docs[name]
+                # The mean cosine over unit vectors equals the dot product with their mean
+                avg_similarity = float(entry["mean"] @ query)
+                max_similarity = float(best_score[doc_id])
+                position = int(best_row[doc_id] - self._doc_offsets[doc_id])
+                results.append({
+                    "name": name,
+                    "max_similarity": max_similarity,
+                    "avg_similarity": avg_similarity,
+                    "best_matching_text": entry["texts"][position]
+                })
+            return results
+
+# Process-wide index shared by the query and upload paths, kept in step with other processes
+# through the corpus version that every PDF write bumps
+index = VectorIndex(version_source=semantic_cache.corpus_version)
+
+def get_vector_index() -> VectorIndex:
+    """Return the process-wide index, building it from pdfdata on first use."""
+    index.ensure_loaded()
+    return index
@@ -1,7 +1,9 @@
 from typing import Tuple, List, Optional
 import trafilatura
 import re
-from sentence_transformers import SentenceTransformer
+import numpy as np
+import model_registry
+import embedding_cache
 import logging
 import asyncio
 from functools import lru_cache
@@ -10,7 +12,8 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
 from queue import Queue
 import time
-from ollama_chat import chat_ollama
+from ollama_chat import chat_ollama_async
+from executors import run_cpu
 import requests
 import os
 import tempfile
@@ -32,25 +35,17 @@ MIN_CONTENT_LENGTH = 50
 SIMILARITY_THRESHOLD = 0.2
 MAX_WORKERS = 15
 CHUNK_BATCH_SIZE = 100 
+QUERY_OPTIMIZER_TIMEOUT = 30  # seconds
 
 # Thread pool for parallel processing
 thread_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS)
-# Thread-local storage for model
-thread_local = threading.local()
 
 # Enable more detailed logging for debugging
 DEBUG_SCRAPING = True
 
 def get_text_model():
-    """Get or create thread-local instance of the text model."""
-    if not hasattr(thread_local, "model"):
-        try:
-            thread_local.model = SentenceTransformer('all-MiniLM-L6-v2')
-            logger.info(f"Initialized model for thread {threading.current_thread().name}")
-        except Exception as e:
-            logger.error(f"Failed to initialize model in thread {threading.current_thread().name}: {e}")
-            raise
-    return thread_local.model
+    """Get the process-wide text model shared with the rest of the backend."""
+    return model_registry.get_model()
 
 @lru_cache(maxsize=1000)
 def clean_and_normalize_text(text: str) -> str:
@@ -69,19 +64,8 @@ def clean_and_normalize_text(text: str) -> str:
         logger.error(f"Error in text cleaning: {e}")
         return ""
 
-def process_text_chunk(chunk: str, query_embedding: List[float]) -> Tuple[float, str]:
-    """Process a single text chunk in a thread."""
-    try:
-        model = get_text_model()
-        chunk_embedding = model.encode(chunk)
-        similarity = float(chunk_embedding @ query_embedding)
-        return similarity, chunk
-    except Exception as e:
-        logger.error(f"Error processing chunk: {e}")
-        return 0.0, ""
-
 def get_relevant_chunks(text: str, query: str, max_chunks: int = MAX_CHUNKS) -> List[str]:
-    """Find the most relevant chunks of text based on the query using parallel processing."""
+    """Find the most relevant chunks of text based on the query using batched embeddings."""
     try:
         if not text or not query:
             logger.warning("Empty text or query provided to get_relevant_chunks")
@@ -96,36 +80,26 @@ def get_relevant_chunks(text: str, query: str, max_chunks: int = MAX_CHUNKS) ->
         if DEBUG_SCRAPING:
             logger.info(f"Processing {len(paragraphs)} paragraphs for query: {query}")
 
-        # Get query embedding using the main thread's model
-        model = get_text_model()
-        query_embedding = model.encode(query).tolist()
+        # Get query embedding from the shared model
+        query_embedding = embedding_cache.encode(query, kind="query")
 
-        # Process chunks in parallel using thread pool
-        chunk_futures = []
         similarities = []
         
-        # Process in batches to avoid memory issues
+        # Encode paragraphs in batches to avoid memory issues
         for i in range(0, len(paragraphs), CHUNK_BATCH_SIZE):
             batch = paragraphs[i:i + CHUNK_BATCH_SIZE]
-            
-            # Submit batch processing tasks to thread pool
-            futures = [
-                thread_pool.submit(process_text_chunk, chunk, query_embedding)
-                for chunk in batch
-            ]
-            chunk_futures.extend(futures)
-
-        # Collect results as they complete
-        for future in as_completed(chunk_futures):
             try:
-                similarity, chunk = future.result()
+                chunk_embeddings = embedding_cache.encode(batch, batch_size=len(batch), kind="web")
+            except Exception as e:
+                logger.error(f"Error processing chunk batch: {e}")
+                continue
+            
+            for chunk, similarity in zip(batch, np.asarray(chunk_embeddings) @ query_embedding):
+                similarity = float(similarity)
                 if DEBUG_SCRAPING:
                     logger.debug(f"Chunk similarity: {similarity:.4f} for chunk: {chunk[:50]}...")
                 if similarity > SIMILARITY_THRESHOLD:
                     similarities.append((similarity, chunk))
-            except Exception as e:
-                logger.error(f"Error collecting chunk result: {e}")
-                continue
 
         # Sort by similarity and get top chunks
         similarities.sort(reverse=True)
@@ -276,9 +250,9 @@ async def scrape_webpage(url: str, query: str) -> Optional[str]:
             logger.info(f"Successfully cleaned content from {url} ({len(cleaned_content)} characters)")
             logger.debug(f"Sample cleaned content: {cleaned_content[:200]}...")
 
-        # Get relevant chunks using parallel processing
+        # Get relevant chunks using batched embeddings
         logger.info(f"Finding relevant chunks from {url} for query: {query}")
-        relevant_chunks = get_relevant_chunks(cleaned_content, query)
+        relevant_chunks = await run_cpu(get_relevant_chunks, cleaned_content, query)
         
         if not relevant_chunks:
             logger.warning(f"No relevant chunks found from {url}")
@@ -316,12 +290,14 @@ async def get_online_context(query: str, num_results: int = 5) -> str:
     """Get and process online content with parallel processing."""
     try:
         logger.info(f"Getting online context for query: {query}")
-        from search_online import get_serpapi_links
+        from search_online import get_serpapi_links_async
 
-        website_search_prompt = chat_ollama(
+        website_search_prompt = await chat_ollama_async(
             "You are a search query optimizer. Your task is to analyze the user's query and generate the most effective search query that will yield relevant websites and articles . Focus on creating a precise, targeted search query that will help find authoritative sources and practical solutions. Return ONLY the optimized search query, nothing else.",
             query, 
-            model="gemma3:4b-it-qat"
+            model="gemma3:4b-it-qat",
+            timeout=QUERY_OPTIMIZER_TIMEOUT,
+            prompt_type="query_optimizer"
         )
         website_search_prompt = " inurl:.html"
 
@@ -329,7 +305,7 @@ async def get_online_context(query: str, num_results: int = 5) -> str:
         
         # Get search results
         logger.info(f"Fetching search results for: {website_search_prompt}")
-        search_results = get_serpapi_links(website_search_prompt, num_results)
+        search_results = await get_serpapi_links_async(website_search_prompt, num_results)
         
         if not search_results:
             logger.warning("No search results found")
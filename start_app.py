@@ -179,7 +179,8 @@ if __name__ == "__main__":
     print("\n" + colored("=== STEP 2: Starting Python AI backend ===", 'blue', attrs=['bold']))
     python_cmd = "python" if sys.platform == "win32" else "python3"
     py_backend_process = run_command(
-        f"{python_cmd} main.py", 
+        # Through uvicorn's module entry point, so PDF extraction workers don't re-import main.py
+        f"{python_cmd} -m uvicorn main:app --host 0.0.0.0 --port 8000", 
         cwd=new_ai_backend_dir, 
         service_name="AI Backend",
         completion_marker=r"Uvicorn running on http://0\.0\.0\.0:8000",